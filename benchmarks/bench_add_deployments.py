@@ -0,0 +1,47 @@
+"""
+Add many deployments to a single service and report the time per add.
+
+    python -m benchmarks.bench_add_deployments [count]
+"""
+import sys
+import time
+import logging
+import tempfile
+
+from chart_builder import Builder
+
+
+def make_deployment(index):
+    return {
+        "name": "web-{:05d}".format(index),
+        "containers": [
+            {
+                "name": "nginx",
+                "image": "nginx",
+                "ports": [{"containerPort": 80}],
+                "env": [{"name": "debug", "value": "1"}],
+            },
+        ],
+    }
+
+
+def run(count):
+    with tempfile.TemporaryDirectory() as path:
+        storage = {"type": "local", "source": {"path": path}}
+        builder = Builder("bench", version="1.0", app_version="1.0",
+                          description="", storage=storage)
+
+        checkpoints = {count // 10 * i for i in range(1, 11)}
+        start = last = time.perf_counter()
+        for i in range(1, count + 1):
+            builder.add_deployment("web", make_deployment(i))
+            if i in checkpoints:
+                now = time.perf_counter()
+                print("{:>6} deployments: {:8.3f}s total, {:8.1f}us/add in last batch".format(
+                    i, now - start, (now - last) / (count // 10) * 1e6))
+                last = now
+
+
+if __name__ == "__main__":
+    logging.getLogger("chart_builder").setLevel(logging.ERROR)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,68 @@
+"""
+Encode the request of one large chart many times: copied into every
+request, through a ChartCache that hashes the chart on each call, and
+through a ChartCache keyed by Builder.chart_digest.
+
+    python -m benchmarks.bench_chart_cache [requests]
+"""
+import sys
+import time
+import logging
+
+from chart_builder import Builder
+from hapi.services import tiller_pb2
+from helm_client.cache import ChartCache
+from benchmarks.bench_add_deployments import make_deployment
+
+# Two templates per service, deployments and services
+SERVICE_COUNT = 100
+TEMPLATE_SIZE = 50 * 1024
+
+
+def build_chart():
+    builder = Builder("bench", version="1.0", app_version="1.0",
+                      description="", storage={"type": "memory"})
+    for i in range(SERVICE_COUNT):
+        builder.add_deployment("svc-{:05d}".format(i), make_deployment(i))
+    chart = builder.build_chart()
+    # Pad the templates to a fixed size, as large charts have
+    filler = b"#" * 79 + b"\n"
+    for template in chart.templates:
+        template.data += filler * max(0, (TEMPLATE_SIZE - len(template.data)) // len(filler))
+    return chart, builder.chart_digest
+
+
+def request(i):
+    return tiller_pb2.InstallReleaseRequest(name="bench", namespace="ns-{}".format(i))
+
+
+def run(count):
+    chart, chart_digest = build_chart()
+    size = chart.ByteSize()
+
+    def copy(i):
+        req = request(i)
+        req.chart.CopyFrom(chart)
+        return req.SerializeToString()
+
+    hashed = ChartCache()
+    keyed = ChartCache()
+    first = {}
+    for name, encode in (
+            ("copy", copy),
+            ("cache", lambda i: hashed.encode_request(request(i), chart)),
+            ("cache+key", lambda i: keyed.encode_request(request(i), chart, chart_digest))):
+        start = time.perf_counter()
+        for i in range(count):
+            data = encode(i)
+            if i == 0:
+                first[name] = data
+        print("{:>9}: {:8.3f}s for {} requests of a {:.1f} MB chart".format(
+            name, time.perf_counter() - start, count, size / 1e6))
+    decoded = [tiller_pb2.InstallReleaseRequest.FromString(data) for data in first.values()]
+    print("identical output: {}".format(all(d == decoded[0] for d in decoded)))
+
+
+if __name__ == "__main__":
+    logging.getLogger("chart_builder").setLevel(logging.ERROR)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
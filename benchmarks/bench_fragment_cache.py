@@ -0,0 +1,77 @@
+"""
+Build a chart of many deployments that share one sidecar container, with
+and without the container fragment cache.
+
+    python -m benchmarks.bench_fragment_cache [deployments]
+"""
+import sys
+import time
+import logging
+
+from chart_builder import Builder
+from chart_builder.resources.render import FragmentCache
+from chart_builder.resources.serializer import SERIALIZER
+
+SIDECAR = {
+    "name": "log-shipper",
+    "image": "fluent/fluent-bit",
+    "version": "1.9",
+    "args": ["-c", "/fluent-bit/etc/fluent-bit.conf"],
+    "env": [{"name": "fluent-host", "valueFrom": {"configMapKeyRef": {"name": "logging", "key": "host"}}}],
+    "ports": [{"containerPort": 2020}],
+    "volume_mounts": [
+        {"name": "varlog", "mountPath": "/var/log"},
+        {"name": "fluent-bit-config", "mountPath": "/fluent-bit/etc/"},
+    ],
+    "liveness_probe": {"initialDelaySeconds": 10, "periodSeconds": 30,
+                       "httpGet": {"path": "/api/v1/health", "port": 2020}},
+    "readiness_probe": {"initialDelaySeconds": 5, "periodSeconds": 10,
+                        "httpGet": {"path": "/api/v1/health", "port": 2020}},
+    "resources": {"limits": {"cpu": "100m", "memory": "128Mi"},
+                  "requests": {"cpu": "50m", "memory": "64Mi"}},
+}
+
+
+def make_deployment(index):
+    return {
+        "name": "web-{:05d}".format(index),
+        "containers": [
+            {"name": "server", "image": "registry/app-{:05d}".format(index), "ports": [{"containerPort": 8080}]},
+            SIDECAR,
+        ],
+    }
+
+
+def build(count):
+    builder = Builder("bench", version="1.0", app_version="1.0",
+                      description="", storage={"type": "memory"})
+    for i in range(count):
+        builder.add_deployment("svc-{:05d}".format(i), make_deployment(i))
+    start = time.perf_counter()
+    chart = builder.build_chart()
+    elapsed = time.perf_counter() - start
+
+    # Container rendering alone, the part the cache covers
+    deployments = [d for service in builder._services.values() for d in service["deployments"]]
+    start = time.perf_counter()
+    for d in deployments:
+        SERIALIZER.containers(d.containers, indent=6)
+    return elapsed, time.perf_counter() - start, chart
+
+
+def run(count):
+    charts = {}
+    default = SERIALIZER.fragment_cache
+    for name, cache in (("no cache", None), ("cache", FragmentCache())):
+        SERIALIZER.fragment_cache = cache
+        elapsed, containers, charts[name] = build(count)
+        stats = "" if cache is None else ", {} hits / {} misses".format(cache.hits, cache.misses)
+        print("{:>8}: {:8.3f}s to build {} deployments, {:8.3f}s to render their containers{}".format(
+            name, elapsed, count, containers, stats))
+    SERIALIZER.fragment_cache = default
+    print("identical output: {}".format(charts["no cache"] == charts["cache"]))
+
+
+if __name__ == "__main__":
+    logging.getLogger("chart_builder").setLevel(logging.ERROR)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1500)
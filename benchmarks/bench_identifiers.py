@@ -0,0 +1,60 @@
+"""
+Check the names of env heavy deployments with jsonschema and with the
+identifier pass, one payload at a time and as one batch.
+
+    python -m benchmarks.bench_identifiers [deployments] [env_per_container]
+"""
+import sys
+import time
+
+from chart_builder.resources.base import NAME_PATTERN
+from chart_builder.resources.deployment import DEPLOYMENT_SCHEMA
+from chart_builder.resources.identifiers import check_identifiers, check_identifiers_batch
+from chart_builder.utils.helper import get_validator
+
+
+def make_deployment(index, env_count):
+    env = [{"name": "env-var-{:04d}".format(i), "value": "1"} for i in range(env_count)]
+    return {
+        "name": "web-{:05d}".format(index),
+        "containers": [
+            {"name": "nginx", "image": "nginx", "env": env},
+            {"name": "log-shipper", "image": "fluentd", "env": env},
+        ],
+        "volumes": [{"name": "config", "configMap": {"name": "web-config"}}],
+    }
+
+
+def names_only(schema):
+    """``schema`` reduced to its NAME_PATTERN checks, what jsonschema spends on names."""
+    if isinstance(schema, dict):
+        if schema.get("pattern") == NAME_PATTERN:
+            return {"pattern": NAME_PATTERN}
+        return {k: names_only(v) for k, v in schema.items()
+                if k in ("properties", "items") or isinstance(v, dict) and k not in ("required",)}
+    return schema
+
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print("{:<32} {:8.3f}s {:8.1f}us/deployment".format(label, elapsed, elapsed / count * 1e6))
+
+
+def run(count, env_count):
+    payloads = [make_deployment(i, env_count) for i in range(count)]
+    full = get_validator(DEPLOYMENT_SCHEMA)
+    names = get_validator(names_only(DEPLOYMENT_SCHEMA))
+
+    timed("jsonschema, full schema", count, lambda: [full(p) for p in payloads])
+    timed("jsonschema, names only", count, lambda: [names(p) for p in payloads])
+    timed("identifiers, per payload", count,
+          lambda: [check_identifiers("deployment", p) for p in payloads])
+    timed("identifiers, one batch", count,
+          lambda: check_identifiers_batch([("deployment", p) for p in payloads]))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50)
@@ -0,0 +1,39 @@
+"""
+Dump the values.yaml of a chart with many services with the C and the pure
+Python YAML emitter.
+
+    python -m benchmarks.bench_values_yaml [services]
+"""
+import sys
+import time
+import logging
+
+from chart_builder import Builder
+from chart_builder.utils import yaml_io
+from chart_builder.utils.yaml_io import dump_yaml
+from benchmarks.bench_add_deployments import make_deployment
+
+
+def build_values(count):
+    storage = {"type": "memory"}
+    builder = Builder("bench", version="1.0", app_version="1.0",
+                      description="", storage=storage)
+    for i in range(count):
+        builder.add_deployment("svc-{:05d}".format(i), make_deployment(i))
+    return builder._values
+
+
+def run(count):
+    values = build_values(count)
+    results = {}
+    for name, dumper in (("C", yaml_io.Dumper), ("Python", yaml_io.PyDumper)):
+        start = time.perf_counter()
+        results[name] = dump_yaml(values, dumper=dumper)
+        print("{:>6} emitter: {:8.3f}s for {} services, {} lines".format(
+            name, time.perf_counter() - start, count, results[name].count("\n")))
+    print("identical output: {}".format(results["C"] == results["Python"]))
+
+
+if __name__ == "__main__":
+    logging.getLogger("chart_builder").setLevel(logging.ERROR)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -1,4 +1,6 @@
 from chart_builder.builder import Builder
+from chart_builder.parallel import build_many
+from chart_builder.catalog import import_catalog
 from chart_builder.utils.logger import configure_logging
 
 configure_logging()
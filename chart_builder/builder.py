@@ -1,15 +1,32 @@
-import yaml
+import json
+import hashlib
 import logging
 
+from google.protobuf.any_pb2 import Any
 from hapi.chart.metadata_pb2 import Metadata
 from hapi.chart.chart_pb2 import Chart
 from chart_builder.storage import Storage
+from chart_builder.package import package_name, write_package
 from hapi.chart.config_pb2 import Config
 from hapi.chart.template_pb2 import Template
-from chart_builder.resources import ResourceTemplate
+from chart_builder.resources import ResourceTemplate, BUILDERS, serialize
+from chart_builder.utils.exceptions import TemplateGenError
+from chart_builder.utils.yaml_io import dump_yaml
+from chart_builder.utils.helper import resource_payload_validator, read_file, \
+    get_default_helm_ignore
 
 LOG = logging.getLogger(__name__)
 
+SERVICE_RESOURCES = {
+    "deployment": "deployments",
+    "service": "services",
+}
+
+GLOBAL_RESOURCES = {
+    "configmap": "configmaps",
+    "secret": "secrets",
+}
+
 
 class Builder(object):
     def __init__(self, chart_name, version, app_version, description, storage):
@@ -21,10 +38,16 @@ class Builder(object):
         self.template_files = []
         self.non_template_files = []
 
-        self.storage = Storage(
-            storage_type=storage['type'],
-            source=storage['source'],
-        )
+        # Only a storage created here is closed by close()
+        self._owns_storage = not isinstance(storage, Storage)
+        if isinstance(storage, Storage):
+            # Shared with other builders, e.g. inside Storage.transaction
+            self.storage = storage
+        else:
+            self.storage = Storage(
+                storage_type=storage['type'],
+                source=storage.get('source'),
+            )
 
         self._templates = {
             "configmaps": [],
@@ -32,11 +55,32 @@ class Builder(object):
         }
         self._values = {}
         self._services = {}
+        # Rendered bytes by chart file name, kept when storage is in memory
+        self._rendered = {}
+        # Digest of the payloads that went into each chart file, the input
+        # digest it was last built from and the digest of its last content
+        self._input_digests = {}
+        self._built_digests = {}
+        self._file_digests = {}
+        self.touched_files = []
         self.chart_metadata = self._get_metadata()
         self._chart = None
+        # Content digest of the last built chart, to key a ChartCache
+        self.chart_digest = None
 
         self.storage.init_workdir(chart_name)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Close the storage if it was created from a storage dict."""
+        if self._owns_storage:
+            self.storage.close()
+
     def add_deployment(self, service_name, deployment):
         if service_name not in self._services:
             self._create_service(service_name)
@@ -44,10 +88,11 @@ class Builder(object):
             self.chart_metadata,
             values=self._values[service_name],
             **self._services[service_name])
+        self._record_input(service_name, "deployment", deployment)
         generator.gen_deployment(deployment)
 
-        self._services[service_name]["deployments"].append(generator.template)
-        self._values[service_name] = generator.values
+        self._services[service_name]["deployments"].append(generator.resource)
+        self._values[service_name].update(generator.changes)
 
     def add_kube_service(self, service_name, kube_service):
         if service_name not in self._services:
@@ -56,24 +101,94 @@ class Builder(object):
             self.chart_metadata,
             values=self._values[service_name],
             **self._services[service_name])
+        self._record_input(service_name, "service", kube_service)
         generator.gen_kube_service(kube_service)
 
-        self._services[service_name]["services"].append(generator.template)
-        self._values[service_name] = generator.values
+        self._services[service_name]["services"].append(generator.resource)
+        self._values[service_name].update(generator.changes)
 
     def add_configmap(self, configmap):
         generator = ResourceTemplate(self.chart_metadata, values=self._values, **self._templates)
+        self._record_input(None, "configmap", configmap)
         generator.gen_configmap(configmap)
 
-        self._templates["configmaps"].append(generator.template)
-        self._values = generator.values
+        self._templates["configmaps"].append(generator.resource)
+        self._values.update(generator.changes)
 
     def add_secret(self, secret):
         generator = ResourceTemplate(self.chart_metadata, values=self._values, **self._templates)
-        generator.gen_configmap(secret)
+        self._record_input(None, "secret", secret)
+        generator.gen_secret(secret)
+
+        self._templates["secrets"].append(generator.resource)
+        self._values.update(generator.changes)
+
+    def add_resources(self, resources, validate=True):
+        """
+        Add a mixed stream of resources in one pass.
+
+        Every item is a dict with ``kind`` (deployment, service, configmap
+        or secret), ``payload`` and, for deployments and services,
+        ``service_name``. All payloads are validated before anything is
+        added, unless the caller already did with ``validate=False``, and
+        values are merged once per service.
+        """
+        groups = {}
+        for resource in resources:
+            kind = resource.get("kind")
+            payload = resource.get("payload") or {}
+            service_name = resource.get("service_name")
+            if kind in GLOBAL_RESOURCES:
+                service_name = None
+            elif kind not in SERVICE_RESOURCES:
+                raise TemplateGenError(kind, "Unknown resource kind")
+            elif not service_name:
+                raise TemplateGenError(kind, "Has not service name.")
+
+            if validate:
+                resource_name = payload.get("name") or service_name
+                resource_payload_validator(resource_name, BUILDERS[kind].VALIDATION_SCHEMA, payload)
+            groups.setdefault(service_name, []).append((kind, payload))
+
+        for service_name, group in groups.items():
+            if service_name is None:
+                self._add_global_resources(group)
+            else:
+                self._add_service_resources(service_name, group)
+
+    def _add_service_resources(self, service_name, resources):
+        if service_name not in self._services:
+            self._create_service(service_name)
+        generator = ResourceTemplate(
+            self.chart_metadata,
+            values=self._values[service_name],
+            **self._services[service_name])
+        for kind, payload in resources:
+            self._record_input(service_name, kind, payload)
+        generator.gen_resources(resources)
+
+        for kind, resource in generator.resource:
+            self._services[service_name][SERVICE_RESOURCES[kind]].append(resource)
+        self._values[service_name].update(generator.changes)
+
+    def _add_global_resources(self, resources):
+        generator = ResourceTemplate(self.chart_metadata, values=self._values, **self._templates)
+        for kind, payload in resources:
+            self._record_input(None, kind, payload)
+        generator.gen_resources(resources)
+
+        for kind, resource in generator.resource:
+            self._templates[GLOBAL_RESOURCES[kind]].append(resource)
+        self._values.update(generator.changes)
 
-        self._templates["secrets"].append(generator.template)
-        self._values = generator.values
+    def add_file(self, file_name, path, use_mmap=False):
+        """
+        Add a non-template file to Chart.files, read as raw bytes from a
+        local ``path``. ``use_mmap`` maps large files instead of reading
+        them through a buffer.
+        """
+        self.non_template_files.append(
+            Any(type_url=file_name, value=read_file(path, use_mmap=use_mmap)))
 
     def set_dependencies(self, dependencies):
         self.dependencies = dependencies
@@ -88,32 +203,45 @@ class Builder(object):
         self._services[service_name]['services'] = []
         self._values[service_name] = {}
 
+    @staticmethod
+    def _template_file(service_name, rsc_type):
+        if service_name is None:
+            return "templates/{}.yaml".format(rsc_type)
+        return "templates/{}_{}.yaml".format(service_name, rsc_type)
+
+    def _record_input(self, service_name, kind, payload):
+        # Chain the payload into the digests of the files it ends up in
+        if service_name is None:
+            rsc_type = GLOBAL_RESOURCES[kind]
+        else:
+            rsc_type = SERVICE_RESOURCES[kind]
+        data = json.dumps([kind, payload], sort_keys=True, default=str).encode('utf-8')
+
+        for file_name in (self._template_file(service_name, rsc_type), "values.yaml"):
+            digest = hashlib.sha1(self._input_digests.get(file_name, "").encode('utf-8'))
+            digest.update(data)
+            self._input_digests[file_name] = digest.hexdigest()
+
     def _update_template(self):
+        self.template_files = []
         for svc_name, rsc in self._services.items():
-            file_name = "templates/{}_{}.yaml"
-
             for rsc_type in ['deployments', 'services']:
-                _fn = file_name.format(svc_name, rsc_type)
+                _fn = self._template_file(svc_name, rsc_type)
                 self.template_files.append(_fn)
-                self.storage.write(
-                    "{}/{}".format(self.chart_name, _fn),
-                    "\n".join(rsc[rsc_type]),
-                )
+                self._write_changed(_fn, lambda: "\n".join(map(serialize, rsc[rsc_type])))
 
-        file_name = "templates/{}.yaml"
         for rsc_type in ['configmaps', 'secrets']:
-            _fn = file_name.format(rsc_type)
+            _fn = self._template_file(None, rsc_type)
             self.template_files.append(_fn)
-            self.storage.write(
-                "{}/{}".format(self.chart_name, _fn),
-                "\n".join(self._templates[rsc_type]),
-            )
+            self._write_changed(_fn, lambda: "\n".join(map(serialize, self._templates[rsc_type])))
 
     def _update_value(self):
-        return self.storage.write(
-            "{}/values.yaml".format(self.chart_name), yaml.dump(self._values))
+        self._write_changed("values.yaml", lambda: dump_yaml(self._values))
 
     def _update_metadata(self):
+        self._write_changed("Chart.yaml", self._get_chart_yaml)
+
+    def _get_chart_yaml(self):
         metadata = self.chart_metadata
         chart_yaml = {
             "apiVersion": metadata.apiVersion,
@@ -122,7 +250,40 @@ class Builder(object):
             "appVersion": metadata.appVersion,
             "description": metadata.description,
         }
-        self.storage.write("{}/Chart.yaml".format(self.chart_name), yaml.dump(chart_yaml))
+        return dump_yaml(chart_yaml)
+
+    def _write_changed(self, file_name, render):
+        """
+        Render and write ``file_name`` only when its inputs or its content
+        changed since the last build.
+        """
+        input_digest = self._input_digests.get(file_name, "")
+        if self._built_digests.get(file_name) == input_digest:
+            return
+
+        content = render()
+        digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        if self._file_digests.get(file_name) != digest:
+            self._write(file_name, content)
+            self._file_digests[file_name] = digest
+            self.touched_files.append(file_name)
+        # Only recorded once the file is written, so a failed write is
+        # retried by the next build
+        self._built_digests[file_name] = input_digest
+
+    def _write(self, file_name, content):
+        path = "{}/{}".format(self.chart_name, file_name)
+        if self.storage.in_memory:
+            content = content.encode('utf-8')
+        self.storage.write(path, content)
+        if self.storage.in_memory:
+            self._rendered[file_name] = content
+
+    def _read(self, file_name):
+        content = self._rendered.get(file_name)
+        if content is None:
+            content = self.storage.read("{}/{}".format(self.chart_name, file_name))
+        return content
 
     def _get_metadata(self):
         return Metadata(
@@ -136,23 +297,37 @@ class Builder(object):
     def _get_templates(self):
         templates = []
         for t_name in self.template_files:
-            templates.append(Template(
-                name=t_name,
-                data=self.storage.read("{}/{}".format(self.chart_name, t_name))
-            ))
+            templates.append(Template(name=t_name, data=self._read(t_name)))
         return templates
 
     def _get_values(self):
-        return Config(raw=self.storage.read("{}/values.yaml".format(self.chart_name)))
+        return Config(raw=self._read("values.yaml"))
 
     def push(self):
-        self.storage.work_dir.push()
+        self.storage.push(self.chart_name)
 
-    def build_chart(self):
+    def _update_files(self):
+        self.touched_files = []
         self._update_metadata()
         self._update_value()
         self._update_template()
 
+    def _get_chart_digest(self):
+        # Built from the digests of the written files, so the chart
+        # content is not hashed again
+        digest = hashlib.sha256()
+        messages = [self.chart_metadata] + list(self.non_template_files) + list(self.dependencies)
+        for message in messages:
+            data = message.SerializeToString(deterministic=True)
+            digest.update(len(data).to_bytes(8, 'big'))
+            digest.update(data)
+        for file_name in ["values.yaml"] + self.template_files:
+            digest.update("{}\0{}\n".format(file_name, self._file_digests[file_name]).encode('utf-8'))
+        return digest.hexdigest()
+
+    def build_chart(self):
+        self._update_files()
+
         templates = self._get_templates()
         values = self._get_values()
 
@@ -164,4 +339,54 @@ class Builder(object):
             dependencies=self.dependencies,
         )
         self._chart = chart
+        self.chart_digest = self._get_chart_digest()
+        LOG.info("Build chart {}, touched files: {}".format(self.chart_name, self.touched_files))
         return chart
+
+    def build_into(self, request):
+        """
+        Build the chart straight into ``request.chart``, e.g. of an
+        InstallReleaseRequest or UpdateReleaseRequest, and return it.
+
+        Templates are added to the request one by one as they are read, so
+        no Template list or Chart message is built and copied on the way.
+        """
+        self._update_files()
+
+        chart = request.chart
+        chart.Clear()
+        chart.metadata.CopyFrom(self.chart_metadata)
+        for t_name in self.template_files:
+            template = chart.templates.add()
+            template.name = t_name
+            template.data = self._read(t_name)
+        chart.values.raw = self._read("values.yaml")
+        chart.files.extend(self.non_template_files)
+        chart.dependencies.extend(self.dependencies)
+
+        self._chart = chart
+        self.chart_digest = self._get_chart_digest()
+        LOG.info("Build chart {} into {}, touched files: {}".format(
+            self.chart_name, type(request).__name__, self.touched_files))
+        return chart
+
+    def _iter_package_files(self, chart):
+        prefix = self.chart_name + "/"
+        yield prefix + "Chart.yaml", self._get_chart_yaml().encode('utf-8')
+        yield prefix + "values.yaml", chart.values.raw.encode('utf-8')
+        for template in sorted(chart.templates, key=lambda t: t.name):
+            yield prefix + template.name, template.data
+        yield prefix + ".helmignore", get_default_helm_ignore().encode('utf-8')
+        for f in sorted(chart.files, key=lambda f: f.type_url):
+            yield prefix + f.type_url, f.value
+
+    def package(self, fileobj, compresslevel=9, mtime=0):
+        """
+        Write the chart as a ``helm package`` compatible gzip tarball into
+        ``fileobj`` and return the package file name (name-version.tgz).
+        Files are streamed from the built chart and never staged on disk.
+        """
+        chart = self.build_chart()
+        write_package(self._iter_package_files(chart), fileobj,
+                      compresslevel=compresslevel, mtime=mtime)
+        return package_name(self.chart_metadata)
@@ -0,0 +1,227 @@
+import re
+import csv
+
+from chart_builder.resources.base import NAME_PATTERN, CONTAINER_SCHEMA
+from chart_builder.resources.identifiers import find_invalid
+from chart_builder.utils.exceptions import DateSchemaValidationError
+
+PULL_POLICIES = frozenset(CONTAINER_SCHEMA["properties"]["pull_policy"]["enum"])
+PORT_SEPARATORS = re.compile(r"[;,\s]+")
+
+REQUIRED_COLUMNS = ("name", "image")
+COLUMNS = REQUIRED_COLUMNS + ("service", "tag", "pull_policy", "replicas", "cpu", "memory", "ports")
+# Report at most this many bad rows per column
+MAX_ERRORS = 10
+
+
+def read_csv(path_or_file):
+    """Read a CSV catalog with a header row into columns; empty cells become None."""
+    if hasattr(path_or_file, "read"):
+        return _read_csv(path_or_file)
+    with open(path_or_file, newline="") as fd:
+        return _read_csv(fd)
+
+
+def _read_csv(fd):
+    reader = csv.reader(fd)
+    header = next(reader, [])
+    columns = {name: [] for name in header}
+    lists = [columns[name] for name in header]
+    for row in reader:
+        for column, value in zip(lists, row):
+            column.append(value or None)
+    return columns
+
+
+def _to_list(column):
+    # pyarrow arrays have to_pylist, numpy arrays tolist
+    if hasattr(column, "to_pylist"):
+        return column.to_pylist()
+    if hasattr(column, "tolist"):
+        return column.tolist()
+    return list(column)
+
+
+def to_columns(catalog):
+    """
+    Turn ``catalog`` into a dict of equally long lists.
+
+    ``catalog`` is a mapping of column name to a sequence, numpy or
+    pyarrow array, a pyarrow Table or a numpy structured array.
+    """
+    if hasattr(catalog, "to_pydict"):
+        columns = catalog.to_pydict()
+    elif getattr(getattr(catalog, "dtype", None), "names", None):
+        columns = {name: catalog[name].tolist() for name in catalog.dtype.names}
+    else:
+        columns = {name: _to_list(column) for name, column in catalog.items()}
+
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise DateSchemaValidationError("catalog", "Unknown columns: {}".format(sorted(unknown)))
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise DateSchemaValidationError("catalog", "Missing columns: {}".format(missing))
+    if len(set(map(len, columns.values()))) > 1:
+        raise DateSchemaValidationError("catalog", "Columns differ in length")
+    return columns
+
+
+def _check(column_name, column, check):
+    """Apply ``check`` to a whole column, collecting the rows it rejects."""
+    errors = []
+    result = []
+    for row, value in enumerate(column):
+        try:
+            result.append(check(value))
+        except (TypeError, ValueError) as e:
+            errors.append("row {}: {}".format(row, e))
+            if len(errors) >= MAX_ERRORS:
+                break
+    if errors:
+        raise DateSchemaValidationError(
+            "catalog", "Column {}: {}".format(column_name, "; ".join(errors)))
+    return result
+
+
+def _names(column_name, column, optional=False):
+    """Check a name column with one batch match."""
+    rows = [i for i, v in enumerate(column) if not (optional and v is None)]
+    invalid = find_invalid([column[i] for i in rows])[:MAX_ERRORS]
+    if invalid:
+        errors = ["row {}: {!r} does not match {}".format(rows[i], column[rows[i]], NAME_PATTERN)
+                  for i in invalid]
+        raise DateSchemaValidationError(
+            "catalog", "Column {}: {}".format(column_name, "; ".join(errors)))
+    return column
+
+
+def _image(value):
+    if not isinstance(value, str) or not value:
+        raise ValueError("image must be a non empty string, got {!r}".format(value))
+    return value
+
+
+def _pull_policy(value):
+    if value is not None and value not in PULL_POLICIES:
+        raise ValueError("{!r} is not one of {}".format(value, sorted(PULL_POLICIES)))
+    return value
+
+
+def _integer(value):
+    if isinstance(value, bool):
+        raise TypeError("{!r} is not an integer".format(value))
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError("{!r} is not an integer".format(value))
+        return int(value)
+    return int(value)
+
+
+def _replicas(min_replicas, max_replicas):
+    def check(value):
+        if value is None or value != value:
+            # Empty cell or NaN
+            return None
+        value = _integer(value)
+        if value < min_replicas or (max_replicas is not None and value > max_replicas):
+            raise ValueError("replicas {} not in [{}, {}]".format(value, min_replicas, max_replicas))
+        return value
+    return check
+
+
+def _quantity(value):
+    if value is None or value != value:
+        return None
+    return str(value)
+
+
+def _ports(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [p for p in PORT_SEPARATORS.split(value) if p]
+    ports = [_integer(p) for p in value]
+    for port in ports:
+        if not 0 < port < 65536:
+            raise ValueError("port {} out of range".format(port))
+    return ports
+
+
+def _string(value):
+    if value is None:
+        return None
+    return str(value)
+
+
+def validate_columns(columns, min_replicas=1, max_replicas=None):
+    """
+    Validate and normalize every column of ``columns`` in one pass each.
+
+    Raises DateSchemaValidationError listing the bad rows of the first
+    bad column.
+    """
+    size = len(columns["name"])
+    checks = {
+        "image": _image,
+        "tag": _string,
+        "pull_policy": _pull_policy,
+        "replicas": _replicas(min_replicas, max_replicas),
+        "cpu": _quantity,
+        "memory": _quantity,
+        "ports": _ports,
+    }
+    result = {"name": _names("name", columns["name"])}
+    if "service" in columns:
+        result["service"] = _names("service", columns["service"], optional=True)
+    for name in COLUMNS:
+        if name in result:
+            continue
+        if name in columns:
+            result[name] = _check(name, columns[name], checks[name])
+        else:
+            result[name] = [None] * size
+    return result
+
+
+def iter_resources(columns):
+    """Yield Builder.add_resources items from validated ``columns``."""
+    rows = zip(*(columns[name] for name in COLUMNS))
+    for name, image, service, tag, pull_policy, replicas, cpu, memory, ports in rows:
+        container = {"name": name, "image": image}
+        if tag is not None:
+            container["version"] = tag
+        if pull_policy is not None:
+            container["pull_policy"] = pull_policy
+        if ports:
+            container["ports"] = [{"containerPort": p} for p in ports]
+        limits = {}
+        if cpu is not None:
+            limits["cpu"] = cpu
+        if memory is not None:
+            limits["memory"] = memory
+        if limits:
+            container["resources"] = {"limits": limits}
+
+        payload = {"name": name, "containers": [container]}
+        if replicas is not None:
+            payload["replicas"] = replicas
+        yield {"kind": "deployment", "service_name": service or name, "payload": payload}
+
+
+def import_catalog(builder, catalog, min_replicas=1, max_replicas=None):
+    """
+    Add one deployment per row of a service catalog to ``builder``.
+
+    ``catalog`` is a CSV path or file, or anything ``to_columns`` takes.
+    Columns are ``name`` and ``image``, and optionally ``service``
+    (defaults to ``name``), ``tag``, ``pull_policy``, ``replicas``,
+    ``cpu``, ``memory`` and ``ports`` (a list or a ``;`` separated
+    string). The columns are validated up front, so the rows skip the
+    per payload schema validation. Returns the number of rows added.
+    """
+    if isinstance(catalog, str) or hasattr(catalog, "read"):
+        catalog = read_csv(catalog)
+    columns = validate_columns(to_columns(catalog), min_replicas, max_replicas)
+    builder.add_resources(iter_resources(columns), validate=False)
+    return len(columns["name"])
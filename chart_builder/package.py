@@ -0,0 +1,29 @@
+import io
+import gzip
+import tarfile
+
+PACKAGE_NAME = "{name}-{version}.tgz"
+
+
+def package_name(chart_metadata):
+    return PACKAGE_NAME.format(name=chart_metadata.name, version=chart_metadata.version)
+
+
+def write_package(files, fileobj, compresslevel=9, mtime=0):
+    """
+    Stream ``(path, bytes)`` pairs as a gzip compressed tar into ``fileobj``.
+
+    Entries get a fixed ``mtime``, owner and mode, and the gzip header
+    carries no file name, so the same files always give the same archive.
+    """
+    with gzip.GzipFile(filename="", mode="wb", fileobj=fileobj,
+                       compresslevel=compresslevel, mtime=mtime) as gz:
+        with tarfile.open(fileobj=gz, mode="w|", format=tarfile.USTAR_FORMAT) as tar:
+            for path, data in files:
+                info = tarfile.TarInfo(path)
+                info.size = len(data)
+                info.mtime = mtime
+                info.mode = 0o644
+                info.uid = info.gid = 0
+                info.uname = info.gname = ""
+                tar.addfile(info, io.BytesIO(data))
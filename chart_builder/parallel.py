@@ -0,0 +1,66 @@
+import logging
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from chart_builder.builder import Builder
+
+LOG = logging.getLogger(__name__)
+
+BuildResult = namedtuple("BuildResult", ["chart_name", "chart", "error"])
+BuildResult.__doc__ = """
+Outcome of one chart in build_many.
+
+``chart`` holds the serialized ``hapi.chart.chart_pb2.Chart`` bytes, or
+None when the build failed, in which case ``error`` describes why.
+"""
+
+
+def build_chart(spec):
+    """
+    Build one chart from a spec and return its serialized Chart bytes.
+
+    A spec is a dict with the Builder arguments (``chart_name``, ``version``,
+    ``app_version``, ``description``, ``storage``), plus optional
+    ``resources`` for Builder.add_resources and ``dependencies``.
+    """
+    with Builder(
+        spec['chart_name'],
+        version=spec['version'],
+        app_version=spec['app_version'],
+        description=spec.get('description') or "",
+        storage=spec['storage'],
+    ) as builder:
+        builder.add_resources(spec.get('resources') or [])
+        if spec.get('dependencies'):
+            builder.set_dependencies(spec['dependencies'])
+        return builder.build_chart().SerializeToString()
+
+
+def _build_one(spec):
+    try:
+        return BuildResult(spec['chart_name'], build_chart(spec), None)
+    except Exception as e:
+        return BuildResult(spec.get('chart_name'), None, "{}: {}".format(type(e).__name__, e))
+
+
+def build_many(specs, workers=None):
+    """
+    Build independent charts in a process pool.
+
+    Returns one BuildResult per spec, in input order. A failing chart only
+    sets the ``error`` of its own result.
+    """
+    specs = list(specs)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_build_one, spec) for spec in specs]
+        for spec, future in zip(specs, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker died, e.g. the pool broke; report it per chart.
+                result = BuildResult(spec.get('chart_name'), None, "{}: {}".format(type(e).__name__, e))
+            if result.error:
+                LOG.warning("Build chart {} failed: {}".format(result.chart_name, result.error))
+            results.append(result)
+    return results
@@ -1,4 +1,3 @@
-import copy
 import logging
 
 from chart_builder.utils.exceptions import TemplateGenError
@@ -6,9 +5,18 @@ from .deployment import DeploymentBuilder
 from .service import ServiceBuilder
 from .configmap import ConfigMapBuilder
 from .secret import SecretBuilder
+from .model import Resource, Container, Deployment, Service, ConfigMap, Secret
+from .serializer import serialize
 
 LOG = logging.getLogger(__name__)
 
+BUILDERS = {
+    "deployment": DeploymentBuilder,
+    "service": ServiceBuilder,
+    "configmap": ConfigMapBuilder,
+    "secret": SecretBuilder,
+}
+
 
 class ResourceTemplate(object):
 
@@ -25,14 +33,20 @@ class ResourceTemplate(object):
         self.chart_metadata = chart_metadata
         self.service_name = service_name or ""
 
-        self._deployments = copy.deepcopy(deployments or {})
-        self._services = copy.deepcopy(services or {})
-        self._configmaps = copy.deepcopy(configmaps or {})
-        self._secrets = copy.deepcopy(secrets or {})
+        # The caller's state is shared, not copied: it is only ever read
+        # here, and the values produced by a build are kept apart in
+        # ``changes`` until somebody asks for the merged view.
+        self._deployments = deployments or {}
+        self._services = services or {}
+        self._configmaps = configmaps or {}
+        self._secrets = secrets or {}
         self._labels = labels
 
         self.build_finish = False
-        self._values = copy.deepcopy(values or {})
+        self._base_values = values or {}
+        self._changes = None
+        self._values = None
+        self._resource = None
         self._template = None
 
     def gen_deployment(self, deploy_payload):
@@ -51,29 +65,79 @@ class ResourceTemplate(object):
         builder = SecretBuilder(self)
         self._gen(builder, cm_payload)
 
+    def gen_resources(self, resources):
+        """
+        Render a batch of already validated ``(kind, payload)`` pairs.
+
+        ``resource`` and ``template`` become lists of ``(kind, resource)`` and
+        ``(kind, template)`` pairs in input order, and the values of the
+        whole batch are merged in one pass.
+        """
+        if self.build_finish:
+            return
+        resources_built = []
+        changes = {}
+        overwrite = set()
+        for kind, payload in resources:
+            builder = BUILDERS[kind](self)
+            builder.build(payload, validate=False)
+            resources_built.append((kind, builder.resource))
+            overwrite.update(builder.values.keys() & changes.keys())
+            changes.update(builder.values)
+
+        if overwrite:
+            LOG.warning("Service {} has overwrite: {}".format(self.service_name, overwrite))
+        self._resource = resources_built
+        self._changes = changes
+        self._check_overwrite(changes)
+        self.build_finish = True
+
     def _gen(self, builder, payload):
         if self.build_finish:
             return
         builder.build(payload)
-        self._template = builder.template
-        self._values = self._merge_values(builder.values)
+        self._resource = builder.resource
+        self._changes = builder.values
+        self._check_overwrite(self._changes)
         self.build_finish = True
 
     @property
-    def template(self):
+    def resource(self):
         if not self.build_finish:
             raise TemplateGenError(self.service_name, "Do not build anything")
+        return self._resource
+
+    @property
+    def template(self):
+        if self._template is None:
+            resource = self.resource
+            if isinstance(resource, list):
+                self._template = [(kind, serialize(r)) for kind, r in resource]
+            else:
+                self._template = serialize(resource)
         return self._template
 
+    @property
+    def changes(self):
+        """Values generated by this resource only, without the base values."""
+        if not self.build_finish:
+            raise TemplateGenError(self.service_name, "Do not build anything")
+        return self._changes
+
     @property
     def values(self):
         if not self.build_finish:
             raise TemplateGenError(self.service_name, "Do not build anything")
+        if self._values is None:
+            self._values = self._merge_values(self._changes)
         return self._values
 
-    def _merge_values(self, values):
-        overwrite = set(values.keys()) & set(self._values.keys())
+    def _check_overwrite(self, values):
+        overwrite = values.keys() & self._base_values.keys()
         if overwrite:
             LOG.warning("Service {} has overwrite: {}".format(self.service_name, overwrite))
-        self._values.update(values)
-        return self._values
+
+    def _merge_values(self, values):
+        merged = dict(self._base_values)
+        merged.update(values)
+        return merged
@@ -1,6 +1,8 @@
-import json
+import copy
+
 from chart_builder.utils.exceptions import TemplateGenError
 from chart_builder.utils.helper import resource_payload_validator
+from .model import Container
 
 NAME_PATTERN = r"^[a-z]([-a-z0-9]*[a-z0-9]){3,30}$"
 IMAGE_PATTERN = r""
@@ -146,24 +148,6 @@ VOLUME_SCHEMA = {
     "additionalProperties": True,
 }
 
-CONTAINER_TEMPLATE = """
-- name: {name}
-  image: "{image}:{tag}"
-  imagePullPolicy: {pull_policy}
-  ports:
-   - name: http
-     containerPort: 80
-     protocol: TCP
-{command}
-{args}
-{env}
-{ports}
-{volume_mounts}
-{liveness_probe}
-{readiness_probe}
-{resources}
-"""
-
 
 class BaseBuilder(object):
     VALIDATION_SCHEMA = {}
@@ -175,13 +159,18 @@ class BaseBuilder(object):
         self.values = {}
 
         self.payload = None
+        self.resource = None
         self.resource_name = None
         self.values_key = None
 
-    def get_safe_payload(self, payload):
+    def get_safe_payload(self, payload, validate=True):
         resource_name = payload.get("name") or self.template.service_name
         self.resource_name = resource_name
-        self.payload = resource_payload_validator(resource_name, self.VALIDATION_SCHEMA, payload)
+        if validate:
+            resource_payload_validator(resource_name, self.VALIDATION_SCHEMA, payload)
+        # Resources are serialized at build time and keep references into
+        # the payload, so later changes by the caller must not reach them
+        self.payload = copy.deepcopy(payload)
 
     @property
     def default_labels(self):
@@ -224,128 +213,72 @@ class BaseBuilder(object):
             "app.kubernetes.io/version": str(chart_metadata.appVersion),
         }
 
-    def get_containers(self, containers, indent):
-        default_tag = self.template.chart_metadata.appVersion
-        content = ""
-        for c in containers:
-            name = c['name']
-
-            values = {}
-            value_key = "{}.{}".format(self.values_key, name).replace("-", "_")
-
-            image = c['image']
-            values["imageVersion"] = c.get('version') or default_tag
-            tag = '{{ .Values.' + value_key + '.imageVersion }}'
-
-            pull_policy = "{{ .Values." + value_key + ".imagePullPolicy }}"
-            values["imagePullPolicy"] = c.get("pull_policy") or "IfNotPresent"
-
-            command = ""
-            if "command" in c:
-                command = "  command: {}".format(json.dumps(c['command']))
-
-            args = ""
-            if "args" in c:
-                args = "  args: {}".format(json.dumps(c['args']))
-
-            env = ""
-            if "env" in c:
-                val_envs = {}
-                env = "  env:\n"
-                for e in c['env']:
-                    if "value" in e:
-                        val_envs[e['name']] = e['value']
-                        e['value'] = "{{ .Values." + value_key + ".env." + e['name'] + " }}"
-                    elif "valueFrom" in e:
-                        if "configMapKeyRef" in e['valueFrom']:
-                            _name = "{{ .Release.Name }}-" + e['valueFrom']['configMapKeyRef']['name']
-                            e['valueFrom']['configMapKeyRef']['name'] = _name
-
-                        if "secretKeyRef" in e['valueFrom']:
-                            _name = "{{ .Release.Name }}-" + e['valueFrom']['secretKeyRef']['name']
-                            e['valueFrom']['secretKeyRef']['name'] = _name
-
-                    env += "  - {}\n".format(json.dumps(e))
-                if val_envs:
-                    values['env'] = val_envs
-
-            ports = ""
-            if "ports" in c:
-                ports = "  ports:\n"
-                for p in c['ports']:
-                    ports += "  - {}\n".format(json.dumps(p))
-
-            volume_mounts = ""
-            if "volume_mounts" in c:
-                volume_mounts = "  volumeMounts:\n"
-                for v in c['volume_mounts']:
-                    volume_mounts += "  - {}\n".format(json.dumps(v))
-
-            readiness_probe = ""
-            if "readiness_probe" in c:
-                readiness_probe = "  readinessProbe: {}".format(json.dumps(c['readiness_probe']))
-
-            liveness_probe = ""
-            if "liveness_probe" in c:
-                liveness_probe = "  livenessProbe: {}".format(json.dumps(c['liveness_probe']))
-
-            resources = ""
-            if "resources" in c:
-                resources = "  resources: {}".format(json.dumps(c['resources']))
-
-            content += CONTAINER_TEMPLATE.format(
-                name=name,
-                image=image,
-                tag=tag,
-                pull_policy=pull_policy,
-                command=command,
-                args=args,
-                env=env,
-                ports=ports,
-                volume_mounts=volume_mounts,
-                readiness_probe=readiness_probe,
-                liveness_probe=liveness_probe,
-                resources=resources,
-            )
-            self.values[name.replace("-", "_")] = values
-
+    def get_containers(self, containers):
+        return [self.get_container(c) for c in containers]
+
+    def _value_key(self, c):
+        return "{}.{}".format(self.values_key, c['name']).replace("-", "_")
+
+    def get_container(self, c):
+        """
+        Set the values of container ``c`` and return it as a Container.
+
+        Env values move to ``.Values`` and referenced ConfigMaps and Secrets
+        get the release name prefix; the payload itself is left as it is.
+        """
+        name = c['name']
+        value_key = self._value_key(c)
+
+        values = {}
+        values["imageVersion"] = c.get('version') or self.template.chart_metadata.appVersion
+        values["imagePullPolicy"] = c.get("pull_policy") or "IfNotPresent"
+
+        env = None
+        if "env" in c:
+            env = []
+            val_envs = {}
+            for e in c['env']:
+                if "value" in e:
+                    val_envs[e['name']] = e['value']
+                    e = dict(e, value="{{ .Values." + value_key + ".env." + e['name'] + " }}")
+                elif "valueFrom" in e:
+                    value_from = dict(e['valueFrom'])
+                    for ref in ("configMapKeyRef", "secretKeyRef"):
+                        if ref in value_from:
+                            value_from[ref] = dict(
+                                value_from[ref], name="{{ .Release.Name }}-" + value_from[ref]['name'])
+                    e = dict(e, valueFrom=value_from)
+                env.append(e)
+            if val_envs:
+                values['env'] = val_envs
+
+        self.values[name.replace("-", "_")] = values
+        return Container(
+            name=name,
+            image=c['image'],
+            tag='{{ .Values.' + value_key + '.imageVersion }}',
+            pull_policy="{{ .Values." + value_key + ".imagePullPolicy }}",
+            command=c.get('command'),
+            args=c.get('args'),
+            env=env,
+            ports=c.get('ports'),
+            volume_mounts=c.get('volume_mounts'),
+            liveness_probe=c.get('liveness_probe'),
+            readiness_probe=c.get('readiness_probe'),
+            resources=c.get('resources'),
+        )
+
+    def get_volumes(self, volumes):
         result = []
-        lines = content.split("\n")
-        for l in lines:
-            if not l:
-                # Delete empty line
-                continue
-            result.append(
-                "{}{}".format(" " * indent, l)
-            )
-
-        return "\n".join(result)
-
-    def get_volumes(self, volumes, indent):
-        content = ""
         for v in volumes:
-            value_key = "{}.{}".format(self.values_key, v['name'])
-
             if "configMap" in v:
                 _name = "{{ .Release.Name }}-" + v['configMap']['name']
-                v['configMap']['name'] = _name
+                v = dict(v, configMap=dict(v['configMap'], name=_name))
             if "secret" in v:
                 _name = "{{ .Release.Name }}-" + v['secret']['secretName']
-                v['secret']['secretName'] = _name
-
-            content += "  - {}\n".format(json.dumps(v))
-
-        result = []
-        lines = content.split("\n")
-        for l in lines:
-            if not l:
-                # Delete empty line
-                continue
-            result.append(
-                "{}{}".format(" " * indent, l)
-            )
-
-        return "\n".join(result)
+                v = dict(v, secret=dict(v['secret'], secretName=_name))
+            result.append(v)
+        return result
 
     def _before_build(self):
         pass
@@ -356,8 +289,8 @@ class BaseBuilder(object):
     def _do_build(self):
         raise NotImplementedError("build not implemented")
 
-    def build(self, payload):
-        self.get_safe_payload(payload)
+    def build(self, payload, validate=True):
+        self.get_safe_payload(payload, validate=validate)
 
         if self.template.service_name:
             self.values_key = ".".join((self.template.service_name, self.resource_name))
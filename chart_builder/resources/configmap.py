@@ -1,4 +1,5 @@
 from .base import BaseBuilder, NAME_PATTERN
+from .model import ConfigMap
 
 CONFIG_MAP_SCHEMA = {
     "type": "object",
@@ -14,17 +15,6 @@ CONFIG_MAP_SCHEMA = {
     "additionalProperties": False,
 }
 
-CONFIG_MAP_TEMPLATE = """
----
-apiVersion: v1
-kind: ConfigMap
-metadata:
-  name: {resource_name}
-data:
-{data}
-"""
-
-
 class ConfigMapBuilder(BaseBuilder):
     VALIDATION_SCHEMA = CONFIG_MAP_SCHEMA
     RESOURCE_TYPE = "ConfigMap"
@@ -33,17 +23,14 @@ class ConfigMapBuilder(BaseBuilder):
         return "{{ .Release.Name }}-" + self.resource_name
 
     def _do_build(self):
-        self.template = CONFIG_MAP_TEMPLATE.format(
-            resource_name=self.get_resource_name(),
+        self.resource = ConfigMap(
+            name=self.get_resource_name(),
             data=self.get_data(),
         )
 
     def get_data(self):
-        data = self.payload['data']
-
-        content = ""
-        for k, v in data.items():
+        data = {}
+        for k, v in self.payload['data'].items():
             self.values[k.replace("-", "_")] = v
-            content += "  {}: {}\n".format(
-                k, "{{ " + ".Values.{}.{}".format(self.values_key, k).replace("-", "_") + " }}")
-        return content
+            data[k] = "{{ " + ".Values.{}.{}".format(self.values_key, k).replace("-", "_") + " }}"
+        return data
@@ -1,7 +1,6 @@
-import json
-
 from .base import BaseBuilder, \
     CONTAINER_SCHEMA, VOLUME_SCHEMA, NAME_PATTERN
+from .model import Deployment
 
 DEPLOYMENT_SCHEMA = {
     "type": "object",
@@ -64,37 +63,6 @@ DEPLOYMENT_SCHEMA = {
     "additionalProperties": False,
 }
 
-DEPLOYMENT_TEMPLATE = """
----
-apiVersion: apps/v1
-kind: Deployment
-metadata:
-  name: {resource_name}
-  labels:
-{deployment_labels}
-{annotations}
-spec:
-  selector:
-    matchLabels:
-{selector}
-  replicas: {replicas}
-  strategy: 
-    type: {strategy}
-  template:
-    metadata:
-      labels:
-{pod_labels}
-    spec:
-{init_containers}
-      containers:
-{containers}
-{volumes}
-{dns_policy}
-{dns_config}
-{image_pull_secrets}
-{scheduling_config}
-"""
-
 SCHEDULING_CONFIG_TEMPLATE = ""
 
 
@@ -111,69 +79,46 @@ class DeploymentBuilder(BaseBuilder):
         pass
 
     def _do_build(self):
-        deploy_labels = self.get_labels(indent=4)
-        pod_labels = self.get_labels(indent=8)
-
-        annotations = ""
-        if "annotations" in self.payload:
-            annotations = "  annotations: {}".format(
-                json.dumps(self.payload['annotations']))
+        labels = self.get_labels()
 
-        init_containers = ""
+        init_containers = None
         if "init_containers" in self.payload:
-            init_containers = "      initContainers:\n"
-            init_containers += self.get_containers(
-                self.payload['init_containers'], indent=6)
+            init_containers = self.get_containers(self.payload['init_containers'])
 
-        volumes = ""
+        volumes = None
         if "volumes" in self.payload:
-            volumes = "      volumes:\n"
-            volumes += self.get_volumes(self.payload['volumes'], indent=4)
-
-        dns_policy = "      dnsPolicy: ClusterFirst"
-        if "dns_policy" in self.payload:
-            dns_policy = "      dnsPolicy: {}".format(self.payload['dns_policy'])
-
-        dns_config = ""
-        if "dns_config" in self.payload:
-            dns_config = "      dnsConfig: {}".format(
-                json.dumps(self.payload['dns_config']))
+            volumes = self.get_volumes(self.payload['volumes'])
 
-        image_pull_secrets = ""
+        image_pull_secrets = None
         if "" in self.payload:
-            image_pull_secrets = "      imagePullSecrets: {}".format(
-                json.dumps(self.payload['image_pull_secrets']))
-
-        self.template = DEPLOYMENT_TEMPLATE.format(
-            resource_name=self.get_release_name(),
-            deployment_labels=deploy_labels,
-            annotations=annotations,
+            image_pull_secrets = self.payload['image_pull_secrets']
+
+        self.get_scheduling_config()
+        self.resource = Deployment(
+            name=self.get_release_name(),
+            labels=labels,
+            annotations=self.payload.get('annotations'),
+            selector=self.default_selector,
             replicas=self.get_replicas(),
             strategy=self.get_strategy(),
-            selector=self.get_selector(),
-            pod_labels=pod_labels,
+            pod_labels=labels,
             init_containers=init_containers,
-            containers=self.get_containers(self.payload['containers'], indent=6),
+            containers=self.get_containers(self.payload['containers']),
             volumes=volumes,
-            dns_policy=dns_policy,
-            dns_config=dns_config,
+            dns_policy=self.payload.get('dns_policy', "ClusterFirst"),
+            dns_config=self.payload.get('dns_config'),
             image_pull_secrets=image_pull_secrets,
-            scheduling_config=self.get_scheduling_config(),
         )
 
     def get_release_name(self):
         return "{{ .Release.Name }}-" + self.resource_name
 
-    def get_labels(self, indent):
-        labels = self.payload.get("labels") or {}
+    def get_labels(self):
+        labels = dict(self.payload.get("labels") or {})
         labels.update(self.default_labels)
 
-        content = ""
-        for k, v in labels.items():
-            content += '{}{}: "{}"\n'.format(" " * indent, k, v)
-
         self.values['labels'] = {}
-        return content
+        return labels
 
     def get_replicas(self):
         self.values['replicaCount'] = self.payload.get("replicas") or 1
@@ -184,14 +129,6 @@ class DeploymentBuilder(BaseBuilder):
         self.values['strategy'] = strategy
         return "{{ .Values." + self.values_key + ".strategy }}"
 
-    def get_selector(self):
-        selector = self.default_selector
-
-        content = ""
-        for k, v in selector.items():
-            content += '      {}: "{}"\n'.format(k, v)
-        return content
-
     def get_scheduling_config(self):
         # TODO add scheduling config
         assert self.values_key
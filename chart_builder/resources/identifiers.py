@@ -0,0 +1,120 @@
+import re
+
+from chart_builder.utils.exceptions import DateSchemaValidationError
+from .base import NAME_PATTERN
+from .deployment import DEPLOYMENT_SCHEMA
+from .service import SERVICE_SCHEMA
+from .configmap import CONFIG_MAP_SCHEMA
+from .secret import SECRET_SCHEMA
+
+# Same language as NAME_PATTERN: a letter, then at least three blocks of
+# dashes followed by a letter or digit. Every string has one parse, so
+# matching stays linear where NAME_PATTERN's nested repeat backtracks.
+_NAME_BODY = r"[a-z](?:-*[a-z0-9]){3,}"
+NAME_RE = re.compile("^" + _NAME_BODY + "$")
+# First line that is not a name, to check many names joined by newlines
+# with a single search
+BAD_LINE_RE = re.compile("^(?!{}$)".format(_NAME_BODY), re.MULTILINE)
+
+SCHEMAS = {
+    "deployment": DEPLOYMENT_SCHEMA,
+    "service": SERVICE_SCHEMA,
+    "configmap": CONFIG_MAP_SCHEMA,
+    "secret": SECRET_SCHEMA,
+}
+
+# Any list index in a path
+ITEMS = None
+
+
+def name_paths(schema, path=()):
+    """Paths of the fields that ``schema`` checks against NAME_PATTERN."""
+    if schema.get("pattern") == NAME_PATTERN:
+        yield path
+    for key, sub_schema in (schema.get("properties") or {}).items():
+        yield from name_paths(sub_schema, path + (key,))
+    if isinstance(schema.get("items"), dict):
+        yield from name_paths(schema["items"], path + (ITEMS,))
+
+
+_PATHS = {kind: tuple(name_paths(schema)) for kind, schema in SCHEMAS.items()}
+
+
+def _pointer(parts):
+    return "".join("/" + str(p).replace("~", "~0").replace("/", "~1") for p in parts)
+
+
+def _collect(node, path, parts, out):
+    if not path:
+        out.append((parts, node))
+        return
+    step, rest = path[0], path[1:]
+    if step is ITEMS:
+        if isinstance(node, list):
+            for i, item in enumerate(node):
+                _collect(item, rest, parts + (i,), out)
+    elif isinstance(node, dict) and step in node:
+        _collect(node[step], rest, parts + (step,), out)
+
+
+def _find(kind, payload):
+    found = []
+    for path in _PATHS[kind]:
+        _collect(payload, path, (), found)
+    return found
+
+
+def iter_identifiers(kind, payload):
+    """Yield ``(json_pointer, value)`` for every name in a ``kind`` payload."""
+    for parts, value in _find(kind, payload):
+        yield _pointer(parts), value
+
+
+def find_invalid(values):
+    """
+    Indexes of the entries of ``values`` that are not valid names.
+
+    All names are joined and searched for a bad line at once; only when
+    one is found, or a value holds a newline of its own, are they checked
+    one by one.
+    """
+    if not values:
+        return []
+    if all(type(v) is str for v in values):
+        joined = "\n".join(values)
+        if joined.count("\n") == len(values) - 1 and not BAD_LINE_RE.search(joined):
+            return []
+    return [i for i, v in enumerate(values) if not isinstance(v, str) or not NAME_RE.search(v)]
+
+
+def _error(resource_name, locations, values, invalid):
+    # Pointers are only built for the names that failed
+    errors = ["{}: {!r} does not match {!r}".format(_pointer(locations[i]), values[i], NAME_PATTERN)
+              for i in invalid]
+    return DateSchemaValidationError(resource_name, "; ".join(errors))
+
+
+def check_identifiers(kind, payload, resource_name=None):
+    """Raise DateSchemaValidationError naming every bad name in ``payload``."""
+    found = _find(kind, payload)
+    values = [v for _, v in found]
+    invalid = find_invalid(values)
+    if invalid:
+        raise _error(resource_name or payload.get("name"), [p for p, _ in found], values, invalid)
+
+
+def check_identifiers_batch(resources):
+    """
+    Check the names of many ``(kind, payload)`` pairs in one pass.
+
+    Pointers in the error are prefixed with the index of the resource.
+    """
+    locations = []
+    values = []
+    for index, (kind, payload) in enumerate(resources):
+        for parts, value in _find(kind, payload):
+            locations.append((index,) + parts)
+            values.append(value)
+    invalid = find_invalid(values)
+    if invalid:
+        raise _error("batch", locations, values, invalid)
@@ -0,0 +1,71 @@
+from .render import payload_digest
+
+
+class Resource(object):
+    """
+    Rendered resource before it is serialized to YAML.
+
+    Fields hold plain JSON data or template expressions such as
+    ``{{ .Values.web.replicaCount }}``; a field is None when the payload
+    did not set it. ``chart_builder.resources.serializer`` turns a
+    resource into template text.
+    """
+    __slots__ = ()
+    KIND = None
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError("{} got unexpected fields: {}".format(
+                type(self).__name__, ", ".join(sorted(fields))))
+
+    def to_dict(self):
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, list):
+                value = [v.to_dict() if isinstance(v, Resource) else v for v in value]
+            data[name] = value
+        return data
+
+    def digest(self):
+        return payload_digest([self.KIND, self.to_dict()])
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}(name={!r})".format(type(self).__name__, getattr(self, "name", None))
+
+
+class Container(Resource):
+    __slots__ = ("name", "image", "tag", "pull_policy", "command", "args", "env", "ports",
+                 "volume_mounts", "liveness_probe", "readiness_probe", "resources")
+    KIND = "container"
+
+
+class Deployment(Resource):
+    __slots__ = ("name", "labels", "annotations", "selector", "replicas", "strategy",
+                 "pod_labels", "init_containers", "containers", "volumes", "dns_policy",
+                 "dns_config", "image_pull_secrets")
+    KIND = "deployment"
+
+
+class Service(Resource):
+    __slots__ = ("name", "type", "selector", "ports")
+    KIND = "service"
+
+
+class ConfigMap(Resource):
+    __slots__ = ("name", "data")
+    KIND = "configmap"
+
+
+class Secret(Resource):
+    __slots__ = ("name", "data")
+    KIND = "secret"
@@ -0,0 +1,108 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class Renderer(object):
+    """
+    Collect indented template lines in one buffer and join them once.
+
+    Fragments written to the renderer are split into lines, empty lines are
+    dropped and every other line gets the indent prefix, so rendering stays
+    linear in the size of the output.
+    """
+
+    def __init__(self, indent=0):
+        self.prefix = " " * indent
+        self._lines = []
+
+    def write(self, fragment):
+        prefix = self.prefix
+        for line in fragment.split("\n"):
+            if not line:
+                # Delete empty line
+                continue
+            self._lines.append(prefix + line)
+
+    def write_line(self, line):
+        self._lines.append(self.prefix + line)
+
+    def write_lines(self, lines):
+        """Append lines that already carry their indent."""
+        self._lines.extend(lines)
+
+    @property
+    def lines(self):
+        return self._lines
+
+    def getvalue(self):
+        return "\n".join(self._lines)
+
+
+def json_list(items, indent):
+    """Render ``items`` as a YAML block list with one JSON document per line."""
+    prefix = " " * indent
+    return "".join([prefix + "- " + json.dumps(i) + "\n" for i in items])
+
+
+def quoted_mapping(mapping, indent):
+    """Render ``mapping`` as ``key: "value"`` lines."""
+    prefix = " " * indent
+    return "".join(['{}{}: "{}"\n'.format(prefix, k, v) for k, v in mapping.items()])
+
+
+def payload_digest(payload):
+    """
+    Digest of ``payload``, key order included: fragments write mapping
+    keys in insertion order, so reordered payloads must not share one.
+    """
+    data = json.dumps(payload, separators=(",", ":"), default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class FragmentCache(object):
+    """
+    Rendered template fragments keyed by a digest of their inputs, with
+    LRU eviction.
+
+    The same sidecar containers show up in many deployments, so the part
+    of each one that does not depend on the values key is rendered once
+    per indent. The cache is shared by concurrent builds, so lookups and
+    updates hold a lock; rendering does not.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, render):
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return fragment
+            self.misses += 1
+
+        fragment = render()
+        with self._lock:
+            self._entries[key] = fragment
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+FRAGMENT_CACHE = FragmentCache()
@@ -1,4 +1,5 @@
 from .base import BaseBuilder, NAME_PATTERN
+from .model import Secret
 
 SECRET_SCHEMA = {
     "type": "object",
@@ -14,18 +15,6 @@ SECRET_SCHEMA = {
     "additionalProperties": False,
 }
 
-SECRET_TEMPLATE = """
----
-apiVersion: v1
-kind: Secret
-metadata:
-  name: {resource_name}
-type: Opaque
-data:
-{data}
-"""
-
-
 class SecretBuilder(BaseBuilder):
     VALIDATION_SCHEMA = SECRET_SCHEMA
     RESOURCE_TYPE = "Secret"
@@ -34,17 +23,14 @@ class SecretBuilder(BaseBuilder):
         return "{{ .Release.Name }}-" + self.resource_name
 
     def _do_build(self):
-        self.template = SECRET_TEMPLATE.format(
-            resource_name=self.get_resource_name(),
+        self.resource = Secret(
+            name=self.get_resource_name(),
             data=self.get_data(),
         )
 
     def get_data(self):
-        data = self.payload['data']
-
-        content = ""
-        for k, v in data.items():
+        data = {}
+        for k, v in self.payload['data'].items():
             self.values[k.replace("-", "_")] = v
-            content += "  {}: {}\n".format(
-                k, "{{ " + ".Values.{}.{}".format(self.values_key, k).replace("-", "_") + " }}")
-        return content
+            data[k] = "{{ " + ".Values.{}.{}".format(self.values_key, k).replace("-", "_") + " }}"
+        return data
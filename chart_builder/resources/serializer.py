@@ -0,0 +1,238 @@
+import json
+
+from .model import Deployment, Service, ConfigMap, Secret
+from .render import Renderer, json_list, quoted_mapping, payload_digest, FRAGMENT_CACHE
+
+# The head holds the values key expressions of the container, the body
+# only its payload, so the body of a sidecar is the same in every deployment
+CONTAINER_HEAD_TEMPLATE = """
+- name: {name}
+  image: "{image}:{tag}"
+  imagePullPolicy: {pull_policy}
+  ports:
+   - name: http
+     containerPort: 80
+     protocol: TCP
+"""
+
+CONTAINER_BODY_TEMPLATE = """
+{command}
+{args}
+{env}
+{ports}
+{volume_mounts}
+{liveness_probe}
+{readiness_probe}
+{resources}
+"""
+
+CONTAINER_TEMPLATE = CONTAINER_HEAD_TEMPLATE + CONTAINER_BODY_TEMPLATE
+
+# Container fields rendered by CONTAINER_BODY_TEMPLATE
+BODY_FIELDS = ("command", "args", "env", "ports", "volume_mounts",
+               "liveness_probe", "readiness_probe", "resources")
+
+DEPLOYMENT_TEMPLATE = """
+---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: {resource_name}
+  labels:
+{deployment_labels}
+{annotations}
+spec:
+  selector:
+    matchLabels:
+{selector}
+  replicas: {replicas}
+  strategy: 
+    type: {strategy}
+  template:
+    metadata:
+      labels:
+{pod_labels}
+    spec:
+{init_containers}
+      containers:
+{containers}
+{volumes}
+{dns_policy}
+{dns_config}
+{image_pull_secrets}
+{scheduling_config}
+"""
+
+SERVICE_TEMPLATE = """
+---
+apiVersion: v1
+kind: Service
+metadata:
+  name: {resouce_name}
+spec:
+  type: {type}
+  selector:
+{selector}
+  ports:
+{ports}
+"""
+
+CONFIG_MAP_TEMPLATE = """
+---
+apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: {resource_name}
+data:
+{data}
+"""
+
+SECRET_TEMPLATE = """
+---
+apiVersion: v1
+kind: Secret
+metadata:
+  name: {resource_name}
+type: Opaque
+data:
+{data}
+"""
+
+
+def _json_field(prefix, value):
+    if value is None:
+        return ""
+    return "{}{}".format(prefix, json.dumps(value))
+
+
+def _json_list_field(header, items):
+    if items is None:
+        return ""
+    return header + json_list(items, indent=2)
+
+
+def _data(data):
+    return "".join(["  {}: {}\n".format(k, v) for k, v in data.items()])
+
+
+class YamlSerializer(object):
+    """
+    Serialize resources from ``chart_builder.resources.model`` to helm
+    template text.
+
+    The body of each container, which does not depend on the values key,
+    is rendered through ``fragment_cache``; set it to None to render every
+    container in full.
+    """
+
+    def __init__(self, fragment_cache=FRAGMENT_CACHE):
+        self.fragment_cache = fragment_cache
+        self._serializers = {
+            Deployment: self.deployment,
+            Service: self.service,
+            ConfigMap: self.configmap,
+            Secret: self.secret,
+        }
+
+    def serialize(self, resource):
+        return self._serializers[type(resource)](resource)
+
+    def container(self, c):
+        return self.container_head(c) + self.container_body(c)
+
+    @staticmethod
+    def container_head(c):
+        return CONTAINER_HEAD_TEMPLATE.format(
+            name=c.name,
+            image=c.image,
+            tag=c.tag,
+            pull_policy=c.pull_policy,
+        )
+
+    @staticmethod
+    def container_body(c):
+        return CONTAINER_BODY_TEMPLATE.format(
+            command=_json_field("  command: ", c.command),
+            args=_json_field("  args: ", c.args),
+            env=_json_list_field("  env:\n", c.env),
+            ports=_json_list_field("  ports:\n", c.ports),
+            volume_mounts=_json_list_field("  volumeMounts:\n", c.volume_mounts),
+            liveness_probe=_json_field("  livenessProbe: ", c.liveness_probe),
+            readiness_probe=_json_field("  readinessProbe: ", c.readiness_probe),
+            resources=_json_field("  resources: ", c.resources),
+        )
+
+    def containers(self, containers, indent):
+        renderer = Renderer(indent)
+        for c in containers:
+            if self.fragment_cache is None:
+                renderer.write(self.container(c))
+            else:
+                renderer.write(self.container_head(c))
+                renderer.write_lines(self._container_body_lines(c, indent))
+        return renderer.getvalue()
+
+    def _container_body_lines(self, c, indent):
+        def render():
+            renderer = Renderer(indent)
+            renderer.write(self.container_body(c))
+            return tuple(renderer.lines)
+        key = payload_digest([getattr(c, name) for name in BODY_FIELDS])
+        return self.fragment_cache.get((key, indent), render)
+
+    @staticmethod
+    def volumes(volumes, indent):
+        renderer = Renderer(indent)
+        for v in volumes:
+            renderer.write_line("  - {}".format(json.dumps(v)))
+        return renderer.getvalue()
+
+    def deployment(self, d):
+        init_containers = ""
+        if d.init_containers is not None:
+            init_containers = "      initContainers:\n" + self.containers(d.init_containers, indent=6)
+
+        volumes = ""
+        if d.volumes is not None:
+            volumes = "      volumes:\n" + self.volumes(d.volumes, indent=4)
+
+        return DEPLOYMENT_TEMPLATE.format(
+            resource_name=d.name,
+            deployment_labels=quoted_mapping(d.labels, indent=4),
+            annotations=_json_field("  annotations: ", d.annotations),
+            replicas=d.replicas,
+            strategy=d.strategy,
+            selector=quoted_mapping(d.selector, indent=6),
+            pod_labels=quoted_mapping(d.pod_labels, indent=8),
+            init_containers=init_containers,
+            containers=self.containers(d.containers, indent=6),
+            volumes=volumes,
+            dns_policy="      dnsPolicy: {}".format(d.dns_policy),
+            dns_config=_json_field("      dnsConfig: ", d.dns_config),
+            image_pull_secrets=_json_field("      imagePullSecrets: ", d.image_pull_secrets),
+            scheduling_config="",
+        )
+
+    @staticmethod
+    def service(s):
+        return SERVICE_TEMPLATE.format(
+            resouce_name=s.name,
+            type=s.type,
+            selector=quoted_mapping(s.selector, indent=4),
+            ports=json_list(s.ports, indent=2),
+        )
+
+    @staticmethod
+    def configmap(cm):
+        return CONFIG_MAP_TEMPLATE.format(resource_name=cm.name, data=_data(cm.data))
+
+    @staticmethod
+    def secret(secret):
+        return SECRET_TEMPLATE.format(resource_name=secret.name, data=_data(secret.data))
+
+
+SERIALIZER = YamlSerializer()
+
+
+def serialize(resource):
+    return SERIALIZER.serialize(resource)
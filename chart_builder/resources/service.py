@@ -1,5 +1,5 @@
-import json
 from .base import BaseBuilder, NAME_PATTERN
+from .model import Service
 
 SERVICE_PORT_SCHEMA = {
     "type": "object",
@@ -49,21 +49,6 @@ SERVICE_SCHEMA = {
     "additionalProperties": False,
 }
 
-SERVICE_TEMPLATE = """
----
-apiVersion: v1
-kind: Service
-metadata:
-  name: {resouce_name}
-spec:
-  type: {type}
-  selector:
-{selector}
-  ports:
-{ports}
-"""
-
-
 class ServiceBuilder(BaseBuilder):
     VALIDATION_SCHEMA = SERVICE_SCHEMA
     RESOURCE_TYPE = "Service"
@@ -72,24 +57,17 @@ class ServiceBuilder(BaseBuilder):
         return "{{ .Release.Name }}-" + self.resource_name
 
     def _do_build(self):
-        self.template = SERVICE_TEMPLATE.format(
-            resouce_name=self.get_resource_name(),
+        self.resource = Service(
+            name=self.get_resource_name(),
             type=self.get_svc_type(),
             selector=self.get_selector(),
-            ports=self.get_ports(),
+            ports=self.payload['ports'],
         )
 
     def get_svc_type(self):
         self.values['serviceType'] = self.payload['type']
         return '{{ .Values.' + self.values_key + '.serviceType }}'
 
-    def get_ports(self):
-        content = ""
-        for p in self.payload['ports']:
-            content += "  - {}\n".format(json.dumps(p))
-
-        return content
-
     def get_selector(self):
         # 默认使用 service name 作为 component name
         selector = self.default_selector
@@ -97,8 +75,4 @@ class ServiceBuilder(BaseBuilder):
             selector.update(self.payload['selector'])
         if "component_name" in self.payload:
             selector['app.kubernetes.io/component'] = self.payload['component_name']
-        content = ""
-        for k, v in selector.items():
-            content += '    {}: "{}"\n'.format(k, v)
-
-        return content
+        return selector
@@ -1,26 +1,71 @@
 import os
+import json
+import hashlib
+import shutil
 import logging
+import weakref
+import threading
+import tarfile
 import tempfile
-from git import Repo
-from urllib.parse import urlparse
+from contextlib import contextmanager
+from git import Repo, Git, GitCommandError
+from urllib.parse import urlparse, urljoin
 
 import chart_builder.utils.helper as helper
+from chart_builder.utils.yaml_io import load_yaml
 from chart_builder.utils.exceptions import StorageError
+from chart_builder.utils.http_pool import ConnectionPool, HTTPError
 
 LOG = logging.getLogger(__name__)
 
+COMMIT_MESSAGE = "Update Helm Chart by ChartBuilder."
+CHART_COMMIT_MESSAGE = "Update Helm Chart {} by ChartBuilder."
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "chartbuilder")
+
 
 class LocalDir(object):
+    in_memory = False
+
     def __init__(self, path):
         self.source_path = path
+        # file path -> (digest, size, mtime) of the content last seen there
+        self._digests = {}
 
     def read(self, path):
         file_path = os.path.join(self.source_path, path)
         return helper.read_file(file_path)
 
     def write(self, path, content):
+        """Write ``content`` unless the file already holds the same bytes."""
         file_path = os.path.join(self.source_path, path)
+        content = helper.encode_content(content)
+        digest = helper.content_digest(content)
+        if self._get_digest(file_path) == digest:
+            return False
+
         helper.write_file(file_path, content)
+        self._set_digest(file_path, digest)
+        return True
+
+    def _get_digest(self, file_path):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            self._digests.pop(file_path, None)
+            return None
+
+        cached = self._digests.get(file_path)
+        if cached and cached[1:] == (stat.st_size, stat.st_mtime_ns):
+            return cached[0]
+
+        digest = helper.file_digest(file_path)
+        self._digests[file_path] = (digest, stat.st_size, stat.st_mtime_ns)
+        return digest
+
+    def _set_digest(self, file_path, digest):
+        stat = os.stat(file_path)
+        self._digests[file_path] = (digest, stat.st_size, stat.st_mtime_ns)
 
     def touch(self, path):
         file_path = os.path.join(self.source_path, path)
@@ -28,7 +73,7 @@ class LocalDir(object):
             return
 
         default_content = ""
-        if path == ".helmignore":
+        if os.path.basename(path) == ".helmignore":
             default_content = helper.get_default_helm_ignore()
         helper.write_file(file_path, default_content)
 
@@ -36,83 +81,477 @@ class LocalDir(object):
         dir_path = os.path.join(self.source_path, sub_path)
         if os.path.exists(dir_path):
             return
-        os.mkdir(dir_path)
+        os.makedirs(dir_path)
 
-    def push(self):
+    def push(self, charts=None, commit_per_chart=False):
         LOG.warning("Do push chart to nowhere")
 
+    def close(self):
+        pass
+
+
+class MemoryDir(object):
+    """Keep the chart files in a dict, encoded as utf-8 bytes."""
+    in_memory = True
 
-class _TmpDir(LocalDir):
     def __init__(self):
-        self._tmp_dir = tempfile.mkdtemp(prefix='chartbuilder-')
+        self.source_path = ""
+        self.files = {}
+
+    def read(self, path):
+        try:
+            return self.files[path]
+        except KeyError:
+            raise StorageError("memory", "No such file: {}".format(path))
+
+    def write(self, path, content):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        self.files[path] = content
+
+    def touch(self, path):
+        if path in self.files:
+            return
+
+        default_content = ""
+        if os.path.basename(path) == ".helmignore":
+            default_content = helper.get_default_helm_ignore()
+        self.write(path, default_content)
+
+    def mkdir(self, sub_path):
+        pass
+
+    def push(self, charts=None, commit_per_chart=False):
+        LOG.warning("Do push chart to nowhere")
+
+    def close(self):
+        pass
+
+
+def _clear_dir(path):
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.unlink(entry.path)
+
+
+class ScratchPool(object):
+    """
+    Reusable empty scratch dirs for _TmpDir work dirs.
+
+    A released dir is emptied and kept for the next build, up to
+    ``max_idle`` of them, instead of being removed and created again.
+    """
+
+    def __init__(self, root=None, max_idle=8, prefill=0):
+        self.root = root
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        for _ in range(prefill):
+            self._idle.append(self._mkdtemp())
+
+    def __len__(self):
+        return len(self._idle)
+
+    def _mkdtemp(self):
+        return tempfile.mkdtemp(prefix='chartbuilder-', dir=self.root)
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._mkdtemp()
+
+    def release(self, path):
+        try:
+            _clear_dir(path)
+        except OSError as e:
+            LOG.warning("Can not clear scratch dir {}: {}".format(path, e))
+            shutil.rmtree(path, ignore_errors=True)
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(path)
+                return
+        shutil.rmtree(path, ignore_errors=True)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for path in idle:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class _TmpDir(LocalDir):
+    """
+    LocalDir under a temp dir. The temp dir is only created, and filled
+    by ``_fetch``, the first time ``source_path`` is used, and removed, or
+    given back to ``scratch_pool``, by ``close``.
+    """
+
+    def __init__(self, sub_path='', scratch_pool=None):
+        self.scratch_pool = scratch_pool
+        self._tmp_dir = None
+        self._finalizer = None
+        super(_TmpDir, self).__init__(sub_path)
+
+    @property
+    def opened(self):
+        return self._tmp_dir is not None
+
+    @property
+    def source_path(self):
+        if self._tmp_dir is None:
+            self._open()
+        if not self._sub_path:
+            return self._tmp_dir
+        return os.path.join(self._tmp_dir, self._sub_path)
+
+    @source_path.setter
+    def source_path(self, sub_path):
+        # Relative to the temp dir
+        self._sub_path = sub_path
+
+    def _open(self):
+        if self.scratch_pool is not None:
+            self._tmp_dir = self.scratch_pool.acquire()
+        else:
+            self._tmp_dir = tempfile.mkdtemp(prefix='chartbuilder-')
+        # Last resort for work dirs that are never closed
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self._tmp_dir, True)
         LOG.info("Create tempdir: {}".format(self._tmp_dir))
-        super(_TmpDir, self).__init__(self._tmp_dir)
+        try:
+            self._fetch()
+        except Exception:
+            self.close()
+            raise
 
-    def __del__(self):
-        os.rmdir(self._tmp_dir)
+    def _fetch(self):
+        pass
 
+    def close(self):
+        if self._tmp_dir is None:
+            return
+        tmp_dir, self._tmp_dir = self._tmp_dir, None
+        self._digests.clear()
+        if self.scratch_pool is not None:
+            self._finalizer.detach()
+            self.scratch_pool.release(tmp_dir)
+        else:
+            self._finalizer()
+        LOG.info("Remove tempdir: {}".format(tmp_dir))
 
-class GitRepo(_TmpDir):
 
-    def __init__(self, repo_url, branch, path):
-        super(GitRepo, self).__init__()
+class GitRepo(_TmpDir):
+    """
+    Chart directory in a git checkout.
+
+    ``depth`` makes a shallow, single branch clone, ``sparse`` checks out
+    ``path`` only, and ``cache_dir`` keeps a bare mirror of the repository
+    there that later builds fetch incrementally and check out with
+    ``git worktree``. A rejected push is rebased and retried up to
+    ``push_retries`` times.
+    """
+
+    def __init__(self, repo_url, branch, path, depth=None, sparse=False, cache_dir=None,
+                 push_retries=3, scratch_pool=None):
+        super(GitRepo, self).__init__(path, scratch_pool)
         self.repo_url = repo_url
         self.branch = branch
+        self.path = path
+        self.depth = depth
+        self.sparse = bool(sparse and path)
+        self.cache_dir = cache_dir
+        self.push_retries = push_retries
         self.git_repo = None
+        self.mirror = None
 
-        self.source_path = os.path.join(self._tmp_dir, path)
+    def _fetch(self):
+        self.clone()
 
     def clone(self):
+        if self.cache_dir:
+            self.git_repo = self._checkout_worktree()
+        else:
+            self.git_repo = self._clone()
+        LOG.info("Git clone repo {} to {}".format(
+            self.repo_url, self._tmp_dir))
+
+    def _clone(self):
+        kwargs = {}
+        if self.depth:
+            kwargs.update(depth=self.depth, single_branch=True)
+        if self.sparse:
+            kwargs.update(no_checkout=True)
+
         repo = Repo.clone_from(
             url=self.repo_url,
             to_path=self._tmp_dir,
-            branch=self.branch
+            branch=self.branch,
+            **kwargs
         )
-        self.git_repo = repo
-        LOG.info("Git clone repo {} to {}".format(
-            self.repo_url, self._tmp_dir))
-
-    def git_commit(self):
-        self.git_repo.git.add(u=True)
-        self.git_repo.index.commit('Update Helm Chart by ChartBuilder.')
+        if self.sparse:
+            repo.git.sparse_checkout("set", self.path)
+            repo.git.checkout(self.branch)
+        return repo
+
+    @property
+    def mirror_path(self):
+        name = hashlib.sha1(self.repo_url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, "git", name + ".git")
+
+    def _update_mirror(self):
+        mirror_path = self.mirror_path
+        if not os.path.isdir(mirror_path):
+            os.makedirs(os.path.dirname(mirror_path), exist_ok=True)
+            Repo.init(mirror_path, bare=True).create_remote("origin", self.repo_url)
+
+        # Run plain git in the mirror: a sparse worktree moves core.bare to
+        # config.worktree, which Repo() does not read.
+        mirror = Git(mirror_path)
+        # Forget worktrees of earlier builds whose temp dirs are gone
+        mirror.worktree("prune")
+        refspec = "+refs/heads/{0}:refs/remotes/origin/{0}".format(self.branch)
+        kwargs = {"depth": self.depth} if self.depth else {}
+        mirror.fetch("origin", refspec, **kwargs)
+        LOG.info("Git fetch {} into mirror {}".format(self.repo_url, mirror_path))
+        return mirror
+
+    def _checkout_worktree(self):
+        self.mirror = self._update_mirror()
+        self.mirror.worktree(
+            "add", "--detach", "--no-checkout", self._tmp_dir, "origin/" + self.branch)
+
+        repo = Repo(self._tmp_dir)
+        if self.sparse:
+            repo.git.sparse_checkout("set", self.path)
+        repo.git.checkout()
+        return repo
+
+    def close(self):
+        super(GitRepo, self).close()
+        self.git_repo = None
+        if self.mirror is not None:
+            # The worktree dir is gone, drop it from the mirror too
+            self.mirror.worktree("prune")
+
+    def git_commit(self, message=COMMIT_MESSAGE, charts=None):
+        """Stage ``charts`` (all of ``path`` when None) and commit them, if changed."""
+        if charts:
+            paths = [os.path.join(self.path, chart) for chart in charts]
+        else:
+            paths = [self.path or "."]
+        # --all also picks up new and removed files, unlike -u
+        self.git_repo.git.add("--all", "--", *paths)
+        if not self.git_repo.git.diff("--cached", "--name-only"):
+            LOG.info("Nothing to commit in {}".format(paths))
+            return False
+        self.git_repo.index.commit(message)
+        return True
 
     def git_push(self):
-        remote = self.git_repo.remote()
-        remote.pull()
-        remote.push()
+        # Name the branch explicitly, worktrees from the mirror are detached
+        for attempt in range(1, self.push_retries + 2):
+            self.git_repo.git.pull("--rebase", "origin", self.branch)
+            try:
+                self.git_repo.git.push("origin", "HEAD:refs/heads/" + self.branch)
+                return
+            except GitCommandError as e:
+                if attempt > self.push_retries:
+                    raise
+                LOG.warning("Git push to {} rejected, rebase and retry: {}".format(
+                    self.repo_url, e.stderr.strip()))
+
+    def push(self, charts=None, commit_per_chart=False):
+        """
+        Commit and push ``charts``, or everything under ``path`` when None.
+
+        With ``commit_per_chart`` each chart gets its own commit; all of
+        them go out in one push.
+        """
+        if not self.opened:
+            LOG.info("Nothing written to {}, skip push".format(self.repo_url))
+            return
 
-    def push(self):
-        self.git_commit()
+        if charts and commit_per_chart:
+            for chart in charts:
+                self.git_commit(CHART_COMMIT_MESSAGE.format(chart), [chart])
+        else:
+            self.git_commit(charts=charts)
         self.git_push()
 
 
+class _HashingReader(object):
+    def __init__(self, fd):
+        self.fd = fd
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.fd.read(size)
+        self.digest.update(data)
+        return data
+
+
+def _version_key(version):
+    """
+    Sort key of a SemVer ``version``: a release sorts above its pre-releases,
+    and versions that do not parse sort below all others.
+    """
+    version = str(version or "").lstrip("v").split("+", 1)[0]
+    core, _, pre = version.partition("-")
+    try:
+        numbers = tuple(int(n) for n in core.split("."))
+    except ValueError:
+        return (0, (), 0, ())
+    # Numeric pre-release identifiers sort below alphanumeric ones
+    pre_key = tuple((0, int(p), "") if p.isdigit() else (1, 0, p) for p in pre.split(".") if pre)
+    return (1, numbers, 0 if pre else 1, pre_key)
+
+
 class ChartRepo(_TmpDir):
-    def __init__(self, repo_url, chart, **kwargs):
-        super(ChartRepo, self).__init__()
+    # Shared by every ChartRepo, so chart downloads reuse connections
+    http_pool = ConnectionPool()
+    # (repo_url, validator) -> parsed index.yaml
+    _indexes = {}
+
+    def __init__(self, repo_url, chart, version=None, headers=None, cache_dir=None,
+                 scratch_pool=None, **kwargs):
+        super(ChartRepo, self).__init__(scratch_pool=scratch_pool)
         repo_scheme = urlparse(repo_url).scheme
 
         self.repo_schema = repo_scheme
-        self.repo_url = repo_url
+        self.repo_url = repo_url.rstrip("/") + "/"
         self.chart = chart
+        self.version = version
+        self.headers = headers or {}
+        self.cache_dir = os.path.join(
+            cache_dir or DEFAULT_CACHE_DIR,
+            hashlib.sha1(self.repo_url.encode('utf-8')).hexdigest())
 
+    def _fetch(self):
         self._get_from_repo()
 
     def _get_from_repo(self):
-        raise StorageError("repo", "Get from repo is not support yet")
+        if self.repo_schema in ("http", "https"):
+            get = self._get_from_http
+        elif self.repo_schema == "s3":
+            get = self._get_from_s3
+        else:
+            raise StorageError("repo", "Unknown repo scheme: {}".format(self.repo_schema))
+
+        entry = self._find_chart(get(self.repo_url, "index.yaml"))
+        get(self.repo_url, entry['urls'][0], entry=entry)
+
+    def _find_chart(self, index):
+        entries = (index.get('entries') or {}).get(self.chart) or []
+        entries = [e for e in entries if e.get('urls')]
+        if self.version is None:
+            # Highest version, whatever order the index lists them in
+            if entries:
+                return max(entries, key=lambda e: _version_key(e.get('version')))
+        else:
+            for entry in entries:
+                if str(entry.get('version')) == str(self.version):
+                    return entry
+        raise StorageError("repo", "Chart {} version {} not found in {}".format(
+            self.chart, self.version or "latest", self.repo_url))
 
-    def _get_from_s3(self, repo_url, file_url):
+    def _get_from_s3(self, repo_url, file_url, entry=None):
         raise StorageError("repo", "S3 is not support yet")
 
-    def _get_from_http(self, repo_url, file_url):
-        raise StorageError("repo", "HTTP is not support yet")
+    def _get_from_http(self, repo_url, file_url, entry=None):
+        url = urljoin(repo_url, file_url)
+        try:
+            if entry is None:
+                return self._get_index(url)
+            return self._extract_chart(url, entry.get('digest'))
+        except (OSError, HTTPError, tarfile.TarError) as e:
+            raise StorageError("repo", "Get {} failed: {}".format(url, e))
+
+    def _get_index(self, url):
+        """
+        Get index.yaml, revalidating the copy cached on disk with
+        ETag / Last-Modified, and parse it once per process.
+        """
+        index_path = os.path.join(self.cache_dir, "index.yaml")
+        meta_path = os.path.join(self.cache_dir, "index.json")
+        meta = {}
+        if os.path.isfile(index_path) and os.path.isfile(meta_path):
+            with open(meta_path) as fd:
+                meta = json.load(fd)
+
+        headers = dict(self.headers)
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        with self.http_pool.get(url, headers) as response:
+            if response.status == 304:
+                LOG.info("Chart repo index {} not modified".format(url))
+            elif response.status == 200:
+                content = response.read()
+                meta = {
+                    'etag': response.getheader('ETag'),
+                    'last_modified': response.getheader('Last-Modified'),
+                }
+                os.makedirs(self.cache_dir, exist_ok=True)
+                helper.write_file(index_path, content)
+                helper.write_file(meta_path, json.dumps(meta))
+            else:
+                raise HTTPError(url, response.status, response.reason)
+
+        # Without validators there is no way to tell the index changed
+        key = None
+        if meta.get('etag') or meta.get('last_modified'):
+            key = (self.repo_url, meta.get('etag'), meta.get('last_modified'))
+        index = self._indexes.get(key)
+        if index is None:
+            with open(index_path, 'rb') as fd:
+                index = load_yaml(fd) or {}
+            if key is not None:
+                self._indexes[key] = index
+        return index
+
+    def _extract_chart(self, url, digest=None):
+        with self.http_pool.get(url, self.headers) as response:
+            if response.status != 200:
+                raise HTTPError(url, response.status, response.reason)
+
+            reader = _HashingReader(response)
+            extract_args = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+            with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+                for member in tar:
+                    self._check_member(member)
+                    tar.extract(member, self._tmp_dir, set_attrs=False, **extract_args)
+            # Hash the trailing bytes too
+            while reader.read(1 << 16):
+                pass
+
+        if digest and reader.digest.hexdigest() != digest:
+            raise StorageError("repo", "Digest of {} does not match index".format(url))
+        LOG.info("Extract chart {} to {}".format(url, self._tmp_dir))
+
+    def _check_member(self, member):
+        path = os.path.normpath(os.path.join(self._tmp_dir, member.name))
+        if not path.startswith(self._tmp_dir + os.sep):
+            raise StorageError("repo", "Unsafe path in chart archive: {}".format(member.name))
+        if not (member.isfile() or member.isdir()):
+            raise StorageError("repo", "Unsupported member in chart archive: {}".format(member.name))
 
 
 class Storage(object):
 
-    def __init__(self, storage_type, source: dict = None):
+    def __init__(self, storage_type, source: dict = None, scratch_pool=None):
+        source = source or {}
         self.sub_path = source.get("sub_path") or ''
 
-        if storage_type == "local":
+        if storage_type == "memory":
+            self.work_dir = MemoryDir()
+
+        elif storage_type == "local":
             try:
                 self.work_dir = LocalDir(source['path'])
             except KeyError:
@@ -124,6 +563,11 @@ class Storage(object):
                     repo_url=source['git_url'],
                     branch=source.get('branch') or 'master',
                     path=source.get('path') or '',
+                    depth=source.get('depth'),
+                    sparse=source.get('sparse'),
+                    cache_dir=source.get('cache_dir'),
+                    push_retries=source.get('push_retries', 3),
+                    scratch_pool=scratch_pool,
                 )
             except KeyError:
                 raise StorageError(storage_type, "Source args: git_url, branch, path")
@@ -135,6 +579,8 @@ class Storage(object):
                     chart=source['chart'],
                     version=source.get('version'),
                     headers=source.get('headers'),
+                    cache_dir=source.get('cache_dir'),
+                    scratch_pool=scratch_pool,
                 )
             except KeyError:
                 raise StorageError(storage_type, "Source args: repo_url, chart, version, headers")
@@ -142,15 +588,78 @@ class Storage(object):
         else:
             raise StorageError(storage_type, "Do not found {} type".format(storage_type))
 
-        self.source_path = os.path.join(self.work_dir.source_path, self.sub_path)
+        # Charts whose work dir is set up on the first read or write
+        self._uninitialized = []
+        # Chart names pushed while a transaction is open, None outside one
+        self._pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Remove the temp dir of a remote work dir, if one was created."""
+        self._uninitialized = []
+        self.work_dir.close()
+
+    @property
+    def in_memory(self):
+        return getattr(self.work_dir, "in_memory", False)
+
+    @property
+    def source_path(self):
+        return os.path.join(self.work_dir.source_path, self.sub_path)
 
     def read(self, file_name):
+        self._init_workdirs()
         return self.work_dir.read(file_name)
 
     def write(self, file_name, content):
-        self.work_dir.write(file_name, content)
+        self._init_workdirs()
+        return self.work_dir.write(file_name, content)
+
+    def push(self, chart_name=None):
+        if self._pending is None:
+            self.work_dir.push()
+        elif chart_name not in self._pending:
+            self._pending.append(chart_name)
+
+    @contextmanager
+    def transaction(self, commit_per_chart=False):
+        """
+        Defer pushes until the block exits, then push all charts at once.
+
+        Builders sharing this storage write to one working tree; their
+        ``push`` only records the chart. On a clean exit the charts are
+        committed together, or one commit each with ``commit_per_chart``,
+        and pushed once. Nothing is pushed if the block raises.
+        """
+        if self._pending is not None:
+            raise StorageError("transaction", "A transaction is already open")
+        self._pending = []
+        try:
+            yield self
+            charts = self._pending
+        finally:
+            self._pending = None
+        if charts:
+            self.work_dir.push(charts=charts, commit_per_chart=commit_per_chart)
 
     def init_workdir(self, chart_name):
+        """
+        Set up the files of ``chart_name`` before the first read or write,
+        so that a remote work dir is not fetched until it is used.
+        """
+        if chart_name not in self._uninitialized:
+            self._uninitialized.append(chart_name)
+
+    def _init_workdirs(self):
+        while self._uninitialized:
+            self._init_workdir(self._uninitialized.pop(0))
+
+    def _init_workdir(self, chart_name):
         self.work_dir.mkdir(chart_name)
         self.work_dir.mkdir(chart_name + "/charts")
         self.work_dir.mkdir(chart_name + "/templates")
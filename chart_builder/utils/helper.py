@@ -1,5 +1,15 @@
-import codecs
-from jsonschema import validate, ValidationError
+import os
+import mmap
+import hashlib
+import tempfile
+from jsonschema import ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
 
 from .exceptions import DateSchemaValidationError
 
@@ -28,21 +38,144 @@ HELM_IGNORE = """
 """
 
 
-def read_file(path):
-    with codecs.open(path, encoding='utf-8', errors='ignore') as fd:
-        content = fd.read()
-    return bytes(bytearray(content, encoding='utf-8'))
+def read_file(path, use_mmap=False, errors=None):
+    """
+    按原始字节读取文件
+    :param path:
+    :param use_mmap: 通过 mmap 读取, 适合较大的非模板文件
+    :param errors: 指定时按 utf-8 解码再编码, 如 'ignore' 会丢弃非法字符
+    :return: bytes
+    """
+    with open(path, 'rb') as fd:
+        if use_mmap:
+            content = _read_mmap(fd)
+        else:
+            content = fd.read()
+
+    if errors is not None:
+        content = content.decode('utf-8', errors=errors).encode('utf-8')
+    return content
+
+
+def _read_mmap(fd):
+    if os.fstat(fd.fileno()).st_size == 0:
+        # mmap can not map an empty file
+        return b''
+    with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm[:]
+
+
+def encode_content(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8', errors='ignore')
+    return content
+
+
+def content_digest(content):
+    return hashlib.sha1(encode_content(content)).hexdigest()
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 def write_file(path, content):
-    with codecs.open(path, mode='w+', encoding='utf-8', errors='ignore') as fd:
-        fd.write(content)
+    """
+    原子写入: 先写入同目录下的临时文件, 再用 os.replace 替换目标文件
+    """
+    content = encode_content(content)
+    dir_name = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.chartbuilder-', dir=dir_name)
+    try:
+        with os.fdopen(fd, 'wb') as tmp_fd:
+            tmp_fd.write(content)
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
 
 
 def get_default_helm_ignore():
     return HELM_IGNORE
 
 
+class _ValidatorRegistry(object):
+    """
+    按 schema 对象的 id 缓存已编译的校验器, 每个 schema 在进程内只检查、编译一次
+    """
+
+    def __init__(self):
+        self._validators = {}
+        self.use_fast_path = False
+
+    def get(self, schema):
+        fast = self.use_fast_path and fastjsonschema is not None
+        key = (id(schema), fast)
+        cached = self._validators.get(key)
+        # 保存 schema 引用, 防止 id 被回收后复用
+        if cached is not None and cached[0] is schema:
+            return cached[1]
+
+        if fast:
+            validator = _FastValidator(schema)
+        else:
+            validator_cls = validator_for(schema)
+            validator_cls.check_schema(schema)
+            validator = _JsonSchemaValidator(validator_cls(schema))
+
+        self._validators[key] = (schema, validator)
+        return validator
+
+    def clear(self):
+        self._validators.clear()
+
+
+class _JsonSchemaValidator(object):
+    def __init__(self, validator):
+        self._validator = validator
+
+    def __call__(self, payload):
+        error = best_match(self._validator.iter_errors(payload))
+        if error is not None:
+            raise error
+
+
+class _FastValidator(object):
+    def __init__(self, schema):
+        validator_for(schema).check_schema(schema)
+        self._validate = fastjsonschema.compile(schema)
+
+    def __call__(self, payload):
+        try:
+            self._validate(payload)
+        except fastjsonschema.JsonSchemaException as e:
+            raise ValidationError(e.message)
+
+
+VALIDATORS = _ValidatorRegistry()
+
+
+def enable_fast_validation(enabled=True):
+    """
+    使用 fastjsonschema 生成的校验代码, 未安装时仍使用 jsonschema
+    """
+    VALIDATORS.use_fast_path = enabled
+
+
+def get_validator(schema):
+    return VALIDATORS.get(schema)
+
+
 def resource_payload_validator(resource_name, schema, payload):
     """
     验证 request.json 中的数据是否合法
@@ -54,7 +187,7 @@ def resource_payload_validator(resource_name, schema, payload):
     """
 
     try:
-        validate(payload, schema)
+        get_validator(schema)(payload)
     except ValidationError as e:
         raise DateSchemaValidationError(resource_name, e)
 
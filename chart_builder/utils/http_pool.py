@@ -0,0 +1,112 @@
+import threading
+import http.client
+from contextlib import contextmanager
+from urllib.parse import urlparse, urljoin
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+# Not sent on when a redirect leaves the scheme and host they were set for
+CREDENTIAL_HEADERS = frozenset(("authorization", "proxy-authorization", "cookie"))
+
+
+class HTTPError(Exception):
+    def __init__(self, url, status, reason):
+        super(HTTPError, self).__init__("GET {} failed: {} {}".format(url, status, reason))
+        self.url = url
+        self.status = status
+
+
+class ConnectionPool(object):
+    """
+    Keep-alive HTTP(S) connections, pooled per scheme and host.
+
+    A connection is taken out of the pool for the duration of one request
+    and put back once its response has been read to the end.
+    """
+
+    def __init__(self, timeout=60, max_idle=4):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, scheme, netloc):
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop()
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _release(self, scheme, netloc, conn, response):
+        # Drain what the caller did not read so the connection can be reused
+        try:
+            while response.read(1 << 16):
+                pass
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            return
+        if response.will_close:
+            conn.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request(self, url, headers):
+        parsed = urlparse(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+
+        conn = self._acquire(parsed.scheme, parsed.netloc)
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException):
+            # An idle connection may have been closed by the server, retry once
+            conn.close()
+            conn = self._acquire(parsed.scheme, parsed.netloc)
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+        return parsed, conn, response
+
+    @contextmanager
+    def get(self, url, headers=None):
+        """
+        Yield the response of a GET, following redirects.
+
+        Credential headers are dropped once a redirect changes the scheme
+        or host, as a CDN or a presigned URL must not get them.
+        """
+        headers = dict(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed, conn, response = self._request(url, headers)
+            if response.status not in REDIRECT_CODES:
+                break
+            location = response.getheader("Location")
+            self._release(parsed.scheme, parsed.netloc, conn, response)
+            url = urljoin(url, location)
+            target = urlparse(url)
+            if (target.scheme, target.netloc) != (parsed.scheme, parsed.netloc):
+                headers = {k: v for k, v in headers.items() if k.lower() not in CREDENTIAL_HEADERS}
+        else:
+            raise HTTPError(url, response.status, "too many redirects")
+
+        try:
+            yield response
+        except BaseException:
+            conn.close()
+            raise
+        self._release(parsed.scheme, parsed.netloc, conn, response)
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
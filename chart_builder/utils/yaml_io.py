@@ -0,0 +1,24 @@
+import yaml
+
+# The libyaml emitter and parser when PyYAML was built with them
+try:
+    from yaml import CDumper as Dumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import Dumper, SafeLoader
+
+PyDumper = yaml.Dumper
+
+
+def dump_yaml(data, sort_keys=True, dumper=None):
+    """
+    Serialize ``data`` to a YAML string.
+
+    Keys are sorted by default, as ``yaml.dump`` does; with
+    ``sort_keys=False`` mappings keep their insertion order. Both give the
+    same text with the C and the pure Python emitter.
+    """
+    return yaml.dump(data, Dumper=dumper or Dumper, sort_keys=sort_keys)
+
+
+def load_yaml(stream):
+    return yaml.load(stream, Loader=SafeLoader)
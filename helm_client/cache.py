@@ -0,0 +1,108 @@
+import hashlib
+import logging
+from collections import OrderedDict
+
+LOG = logging.getLogger(__name__)
+
+
+def _update(digest, data):
+    # Length prefix every field so that adjacent fields can not shift
+    # bytes into each other and collide.
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    digest.update(len(data).to_bytes(8, 'big'))
+    digest.update(data)
+
+
+def chart_digest(chart):
+    """Content digest of a Chart over metadata, templates, values, files and dependencies."""
+    digest = hashlib.sha256()
+    _update(digest, chart.metadata.SerializeToString(deterministic=True))
+
+    _update(digest, str(len(chart.templates)))
+    for template in chart.templates:
+        _update(digest, template.name)
+        _update(digest, template.data)
+
+    _update(digest, chart.values.SerializeToString(deterministic=True))
+
+    _update(digest, str(len(chart.files)))
+    for f in chart.files:
+        _update(digest, f.type_url)
+        _update(digest, f.value)
+
+    _update(digest, str(len(chart.dependencies)))
+    for dependency in chart.dependencies:
+        _update(digest, chart_digest(dependency))
+    return digest.hexdigest()
+
+
+def _varint(value):
+    data = bytearray()
+    while True:
+        bits = value & 0x7f
+        value >>= 7
+        if value:
+            data.append(bits | 0x80)
+        else:
+            data.append(bits)
+            return bytes(data)
+
+
+def encode_with_chart(request, chart_bytes, field_name="chart"):
+    """
+    Serialize ``request`` with an already serialized Chart in its
+    ``field_name`` field. ``request`` itself must not have the field set;
+    the encoded field is appended, which protobuf parses like any other.
+    """
+    field = request.DESCRIPTOR.fields_by_name[field_name]
+    return b"".join((
+        request.SerializeToString(),
+        _varint(field.number << 3 | 2),
+        _varint(len(chart_bytes)),
+        chart_bytes,
+    ))
+
+
+class ChartCache(object):
+    """
+    Serialized Chart bytes keyed by chart_digest, with LRU eviction.
+
+    Pushing the same chart to many namespaces then encodes it once.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, chart, key=None):
+        """
+        Serialized ``chart``. ``key`` is a known content digest of the
+        chart, such as Builder.chart_digest; without one the chart is
+        hashed with chart_digest on every call.
+        """
+        if key is None:
+            key = chart_digest(chart)
+        data = self._entries.get(key)
+        if data is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return data
+
+        self.misses += 1
+        data = chart.SerializeToString()
+        self._entries[key] = data
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return data
+
+    def encode_request(self, request, chart, key=None):
+        return encode_with_chart(request, self.get(chart, key))
+
+    def clear(self):
+        self._entries.clear()
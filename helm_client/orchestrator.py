@@ -0,0 +1,171 @@
+import random
+import asyncio
+import logging
+from collections import namedtuple, defaultdict, deque
+
+import grpc
+
+LOG = logging.getLogger(__name__)
+
+STARTED = "started"
+RETRYING = "retrying"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+ReleaseJob = namedtuple("ReleaseJob", ["chart", "values", "namespace", "name", "upgrade"])
+ReleaseJob.__new__.__defaults__ = (False,)
+
+ReleaseEvent = namedtuple("ReleaseEvent", ["job", "state", "attempt", "release", "error"])
+
+
+class ReleaseOrchestrator(object):
+    """
+    Install or upgrade many releases through one TillerClient.
+
+    At most ``workers`` jobs run at a time, and at most
+    ``namespace_concurrency`` of them in the same namespace. Up to
+    ``lookahead`` jobs are taken ahead of time while their namespace is
+    busy. Calls that fail with one of ``retry_codes`` are retried with
+    exponential backoff.
+    """
+
+    def __init__(self, client, *,
+                 workers=16,
+                 namespace_concurrency=4,
+                 lookahead=1024,
+                 max_retries=5,
+                 backoff=0.5,
+                 max_backoff=30,
+                 retry_codes=(grpc.StatusCode.UNAVAILABLE,)):
+        self.client = client
+        self.workers = workers
+        self.namespace_concurrency = namespace_concurrency
+        self.lookahead = lookahead
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_codes = retry_codes
+
+    async def run(self, jobs):
+        """
+        Run ``jobs`` and yield a ReleaseEvent for every state change.
+
+        The event queue is bounded, so a slow consumer holds the workers
+        back instead of piling up events. Leaving the loop early cancels
+        the jobs that are still running. An error raised by ``jobs`` is
+        raised here once the events before it are consumed.
+        """
+        events = asyncio.Queue(maxsize=self.workers * 2)
+        dispatcher = asyncio.ensure_future(self._dispatch(iter(jobs), events))
+        get = None
+        try:
+            while True:
+                get = asyncio.ensure_future(events.get())
+                await asyncio.wait({get, dispatcher}, return_when=asyncio.FIRST_COMPLETED)
+                if get.done():
+                    yield get.result()
+                    continue
+                get.cancel()
+                # The dispatcher is done, no more events are coming
+                while not events.empty():
+                    yield events.get_nowait()
+                dispatcher.result()
+                return
+        finally:
+            if get is not None:
+                get.cancel()
+            dispatcher.cancel()
+            await asyncio.gather(dispatcher, return_exceptions=True)
+
+    async def rollout(self, jobs):
+        """Run ``jobs`` and return the final event of each one."""
+        results = []
+        async for event in self.run(jobs):
+            if event.state in (SUCCEEDED, FAILED):
+                results.append(event)
+        return results
+
+    async def _dispatch(self, jobs, events):
+        """
+        Start jobs as worker and namespace slots free up.
+
+        A job whose namespace is busy waits in a per namespace queue, and
+        the worker goes on with the next job, so jobs grouped by namespace
+        do not hold the other namespaces back.
+        """
+        waiting = defaultdict(deque)
+        running = defaultdict(int)
+        tasks = {}
+        state = {"waiting": 0, "exhausted": False}
+
+        def take():
+            for namespace, queue in waiting.items():
+                if running[namespace] < self.namespace_concurrency:
+                    state["waiting"] -= 1
+                    job = queue.popleft()
+                    if not queue:
+                        del waiting[namespace]
+                    return job
+            while not state["exhausted"] and state["waiting"] < self.lookahead:
+                try:
+                    job = next(jobs)
+                except StopIteration:
+                    state["exhausted"] = True
+                    break
+                if running[job.namespace] < self.namespace_concurrency:
+                    return job
+                waiting[job.namespace].append(job)
+                state["waiting"] += 1
+            return None
+
+        try:
+            while True:
+                while len(tasks) < self.workers:
+                    job = take()
+                    if job is None:
+                        break
+                    running[job.namespace] += 1
+                    tasks[asyncio.ensure_future(self._run_job(job, events))] = job.namespace
+                if not tasks:
+                    return
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    running[tasks.pop(task)] -= 1
+                    task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1)
+
+    async def _release(self, job):
+        if job.upgrade:
+            return await self.client.update_release(job.name, job.chart, job.values)
+        return await self.client.install_release(
+            job.chart, job.values, name=job.name, namespace=job.namespace)
+
+    async def _run_job(self, job, events):
+        attempt = 1
+        await events.put(ReleaseEvent(job, STARTED, attempt, None, None))
+        while True:
+            try:
+                release = await self._release(job)
+            except grpc.aio.AioRpcError as e:
+                if e.code() in self.retry_codes and attempt <= self.max_retries:
+                    await events.put(ReleaseEvent(job, RETRYING, attempt, None, e))
+                    await asyncio.sleep(self._delay(attempt))
+                    attempt += 1
+                    continue
+                error = e
+            except Exception as e:
+                error = e
+            else:
+                await events.put(ReleaseEvent(job, SUCCEEDED, attempt, release, None))
+                return
+
+            LOG.warning("Release {} in {} failed: {}".format(job.name, job.namespace, error))
+            await events.put(ReleaseEvent(job, FAILED, attempt, None, error))
+            return
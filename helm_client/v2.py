@@ -0,0 +1,197 @@
+import asyncio
+import logging
+from collections import namedtuple
+
+import grpc
+
+from hapi.services import tiller_pb2
+from hapi.services.tiller_pb2_grpc import ReleaseServiceStub
+
+LOG = logging.getLogger(__name__)
+
+TILLER_PORT = 44134
+SERVICE_PATH = "/hapi.services.tiller.ReleaseService/"
+# Tiller rejects clients whose version is not compatible with its own
+HELM_API_VERSION = "2.16.1"
+
+ReleaseSummary = namedtuple("ReleaseSummary", ["name", "version", "status"])
+
+CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+]
+
+
+class TillerClient(object):
+    """
+    Async Tiller client on grpc.aio.
+
+    All calls share one channel, and at most ``max_concurrency`` of them
+    are in flight at a time, so many releases can be installed or upgraded
+    concurrently with ``asyncio.gather``. With a ``chart_cache`` the
+    serialized charts are reused across install and update requests;
+    pass ``chart_key=builder.chart_digest`` so the chart is not hashed
+    on every request.
+    """
+
+    def __init__(self, host="127.0.0.1", port=TILLER_PORT, *,
+                 max_concurrency=32,
+                 timeout=300,
+                 api_version=HELM_API_VERSION,
+                 credentials=None,
+                 channel_options=None,
+                 chart_cache=None):
+        self.target = "{}:{}".format(host, port)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.metadata = (("x-helm-api-client", api_version),)
+        self.credentials = credentials
+        self.channel_options = CHANNEL_OPTIONS + list(channel_options or [])
+        self.chart_cache = chart_cache
+
+        self._channel = None
+        self._stub = None
+        self._raw_methods = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self._connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _connect(self):
+        if self._channel is not None:
+            return
+        if self.credentials is not None:
+            self._channel = grpc.aio.secure_channel(
+                self.target, self.credentials, options=self.channel_options)
+        else:
+            self._channel = grpc.aio.insecure_channel(
+                self.target, options=self.channel_options)
+        self._stub = ReleaseServiceStub(self._channel)
+        # Same methods taking pre-encoded request bytes
+        self._raw_methods = {
+            "InstallRelease": self._channel.unary_unary(
+                SERVICE_PATH + "InstallRelease",
+                response_deserializer=tiller_pb2.InstallReleaseResponse.FromString),
+            "UpdateRelease": self._channel.unary_unary(
+                SERVICE_PATH + "UpdateRelease",
+                response_deserializer=tiller_pb2.UpdateReleaseResponse.FromString),
+        }
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._channel is None:
+            return
+        await self._channel.close()
+        self._channel = None
+        self._stub = None
+        self._raw_methods = None
+
+    @property
+    def stub(self):
+        self._connect()
+        return self._stub
+
+    async def _call(self, method, request, timeout=None):
+        stub = self.stub
+        async with self._semaphore:
+            return await getattr(stub, method)(
+                request, metadata=self.metadata, timeout=timeout or self.timeout)
+
+    async def _call_with_chart(self, method, request, chart, chart_key=None):
+        if self.chart_cache is None:
+            request.chart.CopyFrom(chart)
+            return await self._call(method, request)
+
+        data = self.chart_cache.encode_request(request, chart, chart_key)
+        self._connect()
+        async with self._semaphore:
+            return await self._raw_methods[method](
+                data, metadata=self.metadata, timeout=self.timeout)
+
+    async def install_release(self, chart, values=None, *,
+                              name="", namespace="default", chart_key=None, **kwargs):
+        request = tiller_pb2.InstallReleaseRequest(
+            values=values, name=name, namespace=namespace, **kwargs)
+        response = await self._call_with_chart("InstallRelease", request, chart, chart_key)
+        LOG.info("Install release {} in {}".format(response.release.name, namespace))
+        return response.release
+
+    async def update_release(self, name, chart, values=None, *, chart_key=None, **kwargs):
+        request = tiller_pb2.UpdateReleaseRequest(name=name, values=values, **kwargs)
+        response = await self._call_with_chart("UpdateRelease", request, chart, chart_key)
+        LOG.info("Update release {}".format(name))
+        return response.release
+
+    async def install_release_request(self, request):
+        """Send an InstallReleaseRequest whose chart is already set, e.g. by Builder.build_into."""
+        response = await self._call("InstallRelease", request)
+        LOG.info("Install release {} in {}".format(response.release.name, request.namespace))
+        return response.release
+
+    async def update_release_request(self, request):
+        """Send an UpdateReleaseRequest whose chart is already set."""
+        response = await self._call("UpdateRelease", request)
+        LOG.info("Update release {}".format(request.name))
+        return response.release
+
+    async def rollback_release(self, name, version, **kwargs):
+        request = tiller_pb2.RollbackReleaseRequest(name=name, version=version, **kwargs)
+        response = await self._call("RollbackRelease", request)
+        LOG.info("Rollback release {} to {}".format(name, version))
+        return response.release
+
+    async def get_release_status(self, name, version=0):
+        request = tiller_pb2.GetReleaseStatusRequest(name=name, version=version)
+        return await self._call("GetReleaseStatus", request)
+
+    async def list_releases(self, **kwargs):
+        """
+        Yield the ListReleasesResponse messages of one ListReleases stream.
+
+        A concurrency slot is only held while a message is read, not while
+        the caller handles it, so the caller may use the client meanwhile.
+        """
+        stub = self.stub
+        request = tiller_pb2.ListReleasesRequest(**kwargs)
+        call = stub.ListReleases(request, metadata=self.metadata, timeout=self.timeout)
+        try:
+            while True:
+                async with self._semaphore:
+                    response = await call.read()
+                if response is grpc.aio.EOF:
+                    return
+                yield response
+        finally:
+            call.cancel()
+
+    async def iter_releases(self, page_size=256, summary=False, **kwargs):
+        """
+        Yield every release, fetching ``page_size`` releases per
+        ListReleases call and following ``next`` to the following page.
+
+        Only one page is held at a time. With ``summary`` the releases are
+        projected to ReleaseSummary(name, version, status) as they arrive,
+        so the charts and manifests they carry are dropped right away.
+        Other keyword arguments (``sort_by``, ``status_codes``, ``namespace``
+        ...) go into every ListReleasesRequest.
+        """
+        offset = kwargs.pop("offset", "")
+        while True:
+            next_offset = ""
+            async for response in self.list_releases(limit=page_size, offset=offset, **kwargs):
+                next_offset = response.next
+                for release in response.releases:
+                    if summary:
+                        yield ReleaseSummary(release.name, release.version, release.info.status.code)
+                    else:
+                        yield release
+
+            if not next_offset:
+                return
+            if next_offset == offset:
+                raise RuntimeError("ListReleases returned the same page offset {}".format(offset))
+            offset = next_offset
@@ -0,0 +1,111 @@
+import asyncio
+
+import grpc
+
+from hapi.release.info_pb2 import Info
+from hapi.release.release_pb2 import Release
+from hapi.release.status_pb2 import Status
+from hapi.services import tiller_pb2
+from hapi.services.tiller_pb2_grpc import ReleaseServiceServicer, add_ReleaseServiceServicer_to_server
+
+
+class FakeTiller(ReleaseServiceServicer):
+    """In-process ReleaseService that keeps releases in a dict."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.releases = {}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # method name -> list of status codes to fail the next calls with
+        self.failures = {}
+
+    async def _enter(self, method, request, context):
+        self.requests.append((method, request))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            failures = self.failures.get(method)
+            if failures:
+                await context.abort(failures.pop(0), "fake failure")
+        finally:
+            self.in_flight -= 1
+
+    def _release(self, name, namespace, version, code=Status.DEPLOYED, chart=None):
+        release = Release(
+            name=name,
+            namespace=namespace,
+            version=version,
+            info=Info(status=Status(code=code)),
+        )
+        if chart is not None:
+            release.chart.metadata.CopyFrom(chart.metadata)
+        self.releases[name] = release
+        return release
+
+    async def InstallRelease(self, request, context):
+        await self._enter("InstallRelease", request, context)
+        if request.name in self.releases:
+            await context.abort(grpc.StatusCode.ALREADY_EXISTS, "release exists")
+        release = self._release(request.name, request.namespace, 1, chart=request.chart)
+        return tiller_pb2.InstallReleaseResponse(release=release)
+
+    async def UpdateRelease(self, request, context):
+        await self._enter("UpdateRelease", request, context)
+        current = self.releases.get(request.name)
+        if current is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "release not found")
+        release = self._release(request.name, current.namespace, current.version + 1, chart=request.chart)
+        return tiller_pb2.UpdateReleaseResponse(release=release)
+
+    async def RollbackRelease(self, request, context):
+        await self._enter("RollbackRelease", request, context)
+        current = self.releases.get(request.name)
+        if current is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "release not found")
+        release = self._release(request.name, current.namespace, current.version + 1)
+        return tiller_pb2.RollbackReleaseResponse(release=release)
+
+    async def GetReleaseStatus(self, request, context):
+        await self._enter("GetReleaseStatus", request, context)
+        release = self.releases.get(request.name)
+        if release is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "release not found")
+        return tiller_pb2.GetReleaseStatusResponse(
+            name=release.name, namespace=release.namespace, info=release.info)
+
+    async def ListReleases(self, request, context):
+        """Page through releases sorted by name, like Tiller does."""
+        await self._enter("ListReleases", request, context)
+        names = sorted(self.releases)
+        if request.status_codes:
+            names = [n for n in names if self.releases[n].info.status.code in request.status_codes]
+        if request.namespace:
+            names = [n for n in names if self.releases[n].namespace == request.namespace]
+
+        start = 0
+        if request.offset:
+            start = names.index(request.offset)
+        limit = request.limit or len(names)
+        page = names[start:start + limit]
+        next_name = names[start + limit] if start + limit < len(names) else ""
+
+        chunk = 10
+        for i in range(0, max(len(page), 1), chunk):
+            yield tiller_pb2.ListReleasesResponse(
+                count=len(page[i:i + chunk]),
+                next=next_name,
+                total=len(names),
+                releases=[self.releases[n] for n in page[i:i + chunk]],
+            )
+
+
+async def start_server(servicer):
+    server = grpc.aio.server()
+    add_ReleaseServiceServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    return server, port
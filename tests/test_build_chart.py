@@ -1,5 +1,9 @@
+import copy
 from unittest import TestCase, mock
 from chart_builder import Builder
+from chart_builder.storage import Storage
+from chart_builder.utils.exceptions import DateSchemaValidationError
+from hapi.services import tiller_pb2
 
 containers = [
     {
@@ -134,12 +138,164 @@ class TestBuildChart(TestCase):
             description="",
             storage=self.storage,
         )
-        builder.add_deployment("test-service", deployment)
-        builder.add_kube_service("test-service", kube_svc)
-        builder.add_configmap(config_map)
-        builder.add_secret(secret)
+        builder.add_deployment("test-service", copy.deepcopy(deployment))
+        builder.add_kube_service("test-service", copy.deepcopy(kube_svc))
+        builder.add_configmap(copy.deepcopy(config_map))
+        builder.add_secret(copy.deepcopy(secret))
         print(builder._templates)
         print(builder._services)
         print(builder._values)
 
         builder.build_chart()
+
+    def test_add_resources(self):
+        builder = Builder("testChart", version="1.0", app_version="1.0",
+                          description="", storage=self.storage)
+        builder.add_deployment("test-service", copy.deepcopy(deployment))
+        builder.add_kube_service("test-service", copy.deepcopy(kube_svc))
+        builder.add_configmap(copy.deepcopy(config_map))
+        builder.add_secret(copy.deepcopy(secret))
+
+        batch = Builder("testChart", version="1.0", app_version="1.0",
+                        description="", storage=self.storage)
+        batch.add_resources([
+            {"kind": "deployment", "service_name": "test-service", "payload": copy.deepcopy(deployment)},
+            {"kind": "configmap", "payload": copy.deepcopy(config_map)},
+            {"kind": "service", "service_name": "test-service", "payload": copy.deepcopy(kube_svc)},
+            {"kind": "secret", "payload": copy.deepcopy(secret)},
+        ])
+
+        self.assertEqual(batch._services, builder._services)
+        self.assertEqual(batch._templates, builder._templates)
+        self.assertEqual(batch._values, builder._values)
+
+    def test_add_resources_validate_first(self):
+        builder = Builder("testChart", version="1.0", app_version="1.0",
+                          description="", storage=self.storage)
+        with self.assertRaises(DateSchemaValidationError):
+            builder.add_resources([
+                {"kind": "configmap", "payload": copy.deepcopy(config_map)},
+                {"kind": "service", "service_name": "test-service", "payload": {"name": "bad"}},
+            ])
+        self.assertEqual(builder._templates["configmaps"], [])
+        self.assertEqual(builder._values, {})
+
+    def test_memory_storage(self):
+        builder = Builder("testChart", version="1.0", app_version="1.0",
+                          description="", storage={"type": "memory"})
+        builder.add_configmap(copy.deepcopy(config_map))
+        chart = builder.build_chart()
+
+        files = builder.storage.work_dir.files
+        templates = {t.name: t.data for t in chart.templates}
+        self.assertEqual(templates["templates/configmaps.yaml"], files["testChart/templates/configmaps.yaml"])
+        self.assertIn(b"name: {{ .Release.Name }}-test-cm", templates["templates/configmaps.yaml"])
+        self.assertIn("key1: value1", chart.values.raw)
+
+    def test_incremental_build(self):
+        builder = Builder("testChart", version="1.0", app_version="1.0",
+                          description="", storage={"type": "memory"})
+        builder.add_deployment("test-service", copy.deepcopy(deployment))
+        builder.add_kube_service("test-service", copy.deepcopy(kube_svc))
+        builder.add_configmap(copy.deepcopy(config_map))
+        first = builder.build_chart()
+        self.assertEqual(set(builder.touched_files), {
+            "Chart.yaml", "values.yaml",
+            "templates/test-service_deployments.yaml", "templates/test-service_services.yaml",
+            "templates/configmaps.yaml", "templates/secrets.yaml",
+        })
+
+        builder.build_chart()
+        self.assertEqual(builder.touched_files, [])
+
+        other = copy.deepcopy(deployment)
+        other["name"] = "other-nginx"
+        builder.add_deployment("other-service", other)
+        with mock.patch.object(builder.storage, "write", wraps=builder.storage.write) as write:
+            second = builder.build_chart()
+        self.assertEqual(builder.touched_files, [
+            "values.yaml",
+            "templates/other-service_deployments.yaml",
+            "templates/other-service_services.yaml",
+        ])
+        self.assertEqual(write.call_count, 3)
+
+        self.assertEqual(len(second.templates), len(first.templates) + 2)
+        self.assertEqual(len(set(t.name for t in second.templates)), len(second.templates))
+
+    def test_build_into(self):
+        builder = Builder("testChart", version="1.0", app_version="1.0",
+                          description="", storage={"type": "memory"})
+        builder.add_deployment("test-service", copy.deepcopy(deployment))
+        builder.add_kube_service("test-service", copy.deepcopy(kube_svc))
+        builder.add_configmap(copy.deepcopy(config_map))
+
+        request = tiller_pb2.InstallReleaseRequest(name="test", namespace="web")
+        request.chart.templates.add(name="stale")
+        chart = builder.build_into(request)
+
+        self.assertIs(chart, request.chart)
+        self.assertEqual(request.name, "test")
+        self.assertEqual(request.chart, builder.build_chart())
+        self.assertNotIn("stale", [t.name for t in request.chart.templates])
+
+    def test_payload_changed_after_add(self):
+        builder = Builder("testChart", version="1.0", app_version="1.0",
+                          description="", storage={"type": "memory"})
+        container = {"name": "nginx", "image": "nginx", "ports": [{"containerPort": 80}]}
+        builder.add_deployment("first", {"name": "first-nginx", "containers": [container]})
+        container["ports"][0]["containerPort"] = 9999
+        builder.add_deployment("second", {"name": "second-nginx", "containers": [container]})
+        chart = builder.build_chart()
+
+        templates = {t.name: t.data for t in chart.templates}
+        self.assertIn(b'"containerPort": 80}', templates["templates/first_deployments.yaml"])
+        self.assertIn(b'"containerPort": 9999}', templates["templates/second_deployments.yaml"])
+
+    def test_close(self):
+        with mock.patch.object(Storage, "close") as close:
+            with Builder("testChart", version="1.0", app_version="1.0",
+                         description="", storage={"type": "memory"}) as builder:
+                builder.build_chart()
+            self.assertEqual(close.call_count, 1)
+
+            storage = Storage("memory")
+            with Builder("testChart", version="1.0", app_version="1.0",
+                         description="", storage=storage):
+                pass
+            self.assertEqual(close.call_count, 1)
+
+    def test_failed_write_is_retried(self):
+        builder = Builder("testChart", version="1.0", app_version="1.0",
+                          description="", storage={"type": "memory"})
+        builder.add_deployment("test-service", copy.deepcopy(deployment))
+        path = "testChart/templates/test-service_deployments.yaml"
+        write = builder.storage.write
+
+        def fail_once(file_path, content):
+            if file_path == path and not fail_once.failed:
+                fail_once.failed = True
+                raise OSError("No space left on device")
+            write(file_path, content)
+        fail_once.failed = False
+
+        with mock.patch.object(builder.storage, "write", side_effect=fail_once):
+            with self.assertRaises(OSError):
+                builder.build_chart()
+            chart = builder.build_chart()
+
+        self.assertIn("templates/test-service_deployments.yaml", builder.touched_files)
+        templates = {t.name: t.data for t in chart.templates}
+        self.assertEqual(templates["templates/test-service_deployments.yaml"],
+                         builder.storage.work_dir.files[path])
+
+    def test_chart_digest(self):
+        digests = []
+        for name in ("test-cm", "test-cm", "other-cm"):
+            builder = Builder("testChart", version="1.0", app_version="1.0",
+                              description="", storage={"type": "memory"})
+            builder.add_configmap(dict(copy.deepcopy(config_map), name=name))
+            builder.build_chart()
+            digests.append(builder.chart_digest)
+        self.assertEqual(digests[0], digests[1])
+        self.assertNotEqual(digests[0], digests[2])
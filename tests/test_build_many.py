@@ -0,0 +1,56 @@
+import tempfile
+from unittest import TestCase, mock
+
+from chart_builder import build_many
+from chart_builder.parallel import build_chart
+from chart_builder.storage import Storage
+from hapi.chart.chart_pb2 import Chart
+
+deployment = {
+    "name": "test-nginx",
+    "containers": [{"name": "nginx", "image": "nginx"}],
+}
+
+
+class TestBuildMany(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = {"type": "local", "source": {"path": self.tmp_dir.name}}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _spec(self, chart_name, payload):
+        return {
+            "chart_name": chart_name,
+            "version": "1.0",
+            "app_version": "1.0",
+            "storage": self.storage,
+            "resources": [
+                {"kind": "deployment", "service_name": "web", "payload": payload},
+            ],
+        }
+
+    def test_build_many(self):
+        specs = [
+            self._spec("chart-a", deployment),
+            self._spec("chart-b", {"name": "bad"}),
+            self._spec("chart-c", deployment),
+        ]
+        results = build_many(specs, workers=2)
+
+        self.assertEqual([r.chart_name for r in results], ["chart-a", "chart-b", "chart-c"])
+        self.assertIsNone(results[0].error)
+        self.assertIsNone(results[1].chart)
+        self.assertIn("DateSchemaValidationError", results[1].error)
+
+        chart = Chart.FromString(results[2].chart)
+        self.assertEqual(chart.metadata.name, "chart-c")
+        self.assertIn("templates/web_deployments.yaml", [t.name for t in chart.templates])
+
+    def test_build_chart_closes_storage(self):
+        with mock.patch.object(Storage, "close") as close:
+            Chart.FromString(build_chart(self._spec("chart-a", deployment)))
+            with self.assertRaises(Exception):
+                build_chart(self._spec("chart-b", {"name": "bad"}))
+        self.assertEqual(close.call_count, 2)
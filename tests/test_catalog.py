@@ -0,0 +1,91 @@
+import io
+import copy
+from unittest import TestCase
+
+from chart_builder.builder import Builder
+from chart_builder.catalog import import_catalog, read_csv, to_columns, validate_columns, iter_resources
+from chart_builder.utils.exceptions import DateSchemaValidationError
+
+CATALOG_CSV = """name,image,tag,replicas,cpu,memory,ports,pull_policy
+web-frontend,nginx,1.19,3,0.5,512Mi,80;443,Always
+api-backend,python,3.8,,1,1Gi,8080,
+log-shipper,fluentd,,1,,,,
+"""
+
+
+class FakeArray(object):
+    """Stands in for a numpy array, which converts with tolist()."""
+
+    def __init__(self, items):
+        self.items = items
+
+    def tolist(self):
+        return list(self.items)
+
+
+class TestCatalog(TestCase):
+
+    def builder(self):
+        return Builder("catalog", version="1.0", app_version="1.0", description="",
+                       storage={"type": "memory"})
+
+    def test_import_csv(self):
+        builder = self.builder()
+        self.assertEqual(import_catalog(builder, io.StringIO(CATALOG_CSV)), 3)
+        self.assertEqual(list(builder._services), ["web-frontend", "api-backend", "log-shipper"])
+
+        values = builder._values["web-frontend"]["web_frontend"]
+        self.assertEqual(values["replicaCount"], 3)
+        self.assertEqual(values["web_frontend"], {"imageVersion": "1.19", "imagePullPolicy": "Always"})
+        self.assertEqual(builder._values["api-backend"]["api_backend"]["replicaCount"], 1)
+
+        container = builder._services["web-frontend"]["deployments"][0].containers[0]
+        self.assertEqual(container.ports, [{"containerPort": 80}, {"containerPort": 443}])
+        self.assertEqual(container.resources, {"limits": {"cpu": "0.5", "memory": "512Mi"}})
+
+    def test_same_as_add_resources(self):
+        columns = validate_columns(to_columns(read_csv(io.StringIO(CATALOG_CSV))))
+        resources = list(iter_resources(columns))
+
+        imported = self.builder()
+        import_catalog(imported, io.StringIO(CATALOG_CSV))
+        validated = self.builder()
+        validated.add_resources(copy.deepcopy(resources))
+        self.assertEqual(imported._services, validated._services)
+        self.assertEqual(imported._values, validated._values)
+
+    def test_arrays(self):
+        builder = self.builder()
+        import_catalog(builder, {
+            "name": FakeArray(["web-frontend", "api-backend"]),
+            "image": FakeArray(["nginx", "python"]),
+            "replicas": FakeArray([2.0, float("nan")]),
+            "ports": [[80], []],
+            "service": ["shop", None],
+        })
+        self.assertEqual(list(builder._services), ["shop", "api-backend"])
+        self.assertEqual(builder._values["shop"]["web_frontend"]["replicaCount"], 2)
+
+    def test_column_errors(self):
+        cases = [
+            ({"name": ["web"], "image": ["nginx"]}, "Column name: row 0"),
+            ({"name": ["web-frontend", "Bad_Name"], "image": ["nginx", "nginx"]}, "row 1"),
+            ({"name": ["web-frontend"], "image": ["nginx"], "pull_policy": ["Sometimes"]}, "pull_policy"),
+            ({"name": ["web-frontend"], "image": ["nginx"], "replicas": [0]}, "replicas 0 not in"),
+            ({"name": ["web-frontend"], "image": ["nginx"], "replicas": ["1.5"]}, "Column replicas"),
+            ({"name": ["web-frontend"], "image": ["nginx"], "ports": ["80;http"]}, "Column ports"),
+            ({"name": ["web-frontend"]}, "Missing columns"),
+            ({"name": ["web-frontend"], "image": ["nginx"], "color": ["red"]}, "Unknown columns"),
+            ({"name": ["web-frontend"], "image": []}, "differ in length"),
+        ]
+        for catalog, message in cases:
+            with self.subTest(message=message):
+                with self.assertRaises(DateSchemaValidationError) as cm:
+                    import_catalog(self.builder(), catalog)
+                self.assertIn(message, str(cm.exception))
+
+        builder = self.builder()
+        with self.assertRaises(DateSchemaValidationError):
+            import_catalog(builder, {"name": ["web-frontend"], "image": ["nginx"], "replicas": [20]},
+                           max_replicas=10)
+        self.assertEqual(builder._services, {})
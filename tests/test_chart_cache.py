@@ -0,0 +1,84 @@
+from unittest import TestCase, IsolatedAsyncioTestCase, mock
+
+from hapi.chart.chart_pb2 import Chart
+from hapi.chart.config_pb2 import Config
+from hapi.chart.metadata_pb2 import Metadata
+from hapi.chart.template_pb2 import Template
+from hapi.services import tiller_pb2
+from helm_client.cache import ChartCache, chart_digest, encode_with_chart
+from helm_client.v2 import TillerClient
+from tests.fake_tiller import FakeTiller, start_server
+
+
+def make_chart(data=b"kind: Service\n"):
+    return Chart(
+        metadata=Metadata(name="test-chart", version="0.1"),
+        templates=[Template(name="templates/web_services.yaml", data=data * 1000)],
+        values=Config(raw="web: {}\n"),
+    )
+
+
+class TestChartCache(TestCase):
+
+    def test_digest(self):
+        self.assertEqual(chart_digest(make_chart()), chart_digest(make_chart()))
+        self.assertNotEqual(chart_digest(make_chart()), chart_digest(make_chart(b"kind: Pod\n")))
+
+        chart = make_chart()
+        chart.dependencies.add().CopyFrom(make_chart())
+        self.assertNotEqual(chart_digest(chart), chart_digest(make_chart()))
+
+    def test_encode_request(self):
+        chart = make_chart()
+        request = tiller_pb2.InstallReleaseRequest(name="web", namespace="prod")
+        data = encode_with_chart(request, chart.SerializeToString())
+
+        expected = tiller_pb2.InstallReleaseRequest(name="web", namespace="prod", chart=chart)
+        self.assertEqual(tiller_pb2.InstallReleaseRequest.FromString(data), expected)
+
+    def test_reuse(self):
+        cache = ChartCache(max_entries=1)
+        data = cache.get(make_chart())
+        self.assertIs(cache.get(make_chart()), data)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.get(make_chart(b"kind: Pod\n"))
+        self.assertEqual(len(cache), 1)
+
+    def test_key(self):
+        cache = ChartCache()
+        with mock.patch("helm_client.cache.chart_digest") as digest:
+            data = cache.get(make_chart(), key="built")
+            self.assertIs(cache.get(make_chart(), key="built"), data)
+        digest.assert_not_called()
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+class TestClientChartCache(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tiller = FakeTiller()
+        self.server, port = await start_server(self.tiller)
+        self.cache = ChartCache()
+        self.client = TillerClient(port=port, chart_cache=self.cache)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop(None)
+
+    async def test_install_many_namespaces(self):
+        for i in range(5):
+            release = await self.client.install_release(
+                make_chart(), name="web-{}".format(i), namespace="ns-{}".format(i))
+            self.assertEqual(release.namespace, "ns-{}".format(i))
+        await self.client.update_release("web-0", make_chart())
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (5, 1))
+        for method, request in self.tiller.requests:
+            self.assertEqual(request.chart, make_chart())
+
+    async def test_chart_key(self):
+        await self.client.install_release(make_chart(), name="web", chart_key="built")
+        await self.client.update_release("web", make_chart(), chart_key="built")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertIn("built", self.cache._entries)
@@ -0,0 +1,169 @@
+import io
+import os
+import hashlib
+import tarfile
+import tempfile
+import threading
+from functools import partial
+from types import SimpleNamespace
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from unittest import TestCase
+
+from chart_builder.storage import Storage, ChartRepo
+from chart_builder.utils.http_pool import ConnectionPool
+from chart_builder.utils.exceptions import StorageError
+
+INDEX = """
+apiVersion: v1
+entries:
+  nginx:
+  - name: nginx
+    version: 1.1.0
+    digest: {digest_new}
+    urls:
+    - charts/nginx-1.1.0.tgz
+  - name: nginx
+    version: 1.0.0
+    digest: {digest_old}
+    urls:
+    - charts/nginx-1.0.0.tgz
+"""
+
+
+def make_package(version):
+    files = {
+        "nginx/Chart.yaml": "name: nginx\nversion: {}\n".format(version),
+        "nginx/values.yaml": "replicaCount: 1\n",
+        "nginx/templates/deployment.yaml": "kind: Deployment\n",
+    }
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, content in files.items():
+            data = content.encode('utf-8')
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class Handler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.client_address[1], self.headers.get("Authorization")))
+        if self.path.startswith("/moved?to="):
+            self.send_response(302)
+            self.send_header("Location", self.path[len("/moved?to="):])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super(Handler, self).do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestChartRepo(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(cls.root.name, "charts"))
+        digests = {}
+        for version in ("1.0.0", "1.1.0"):
+            package = make_package(version)
+            digests[version] = hashlib.sha256(package).hexdigest()
+            with open(os.path.join(cls.root.name, "charts", "nginx-{}.tgz".format(version)), "wb") as fd:
+                fd.write(package)
+        with open(os.path.join(cls.root.name, "index.yaml"), "w") as fd:
+            fd.write(INDEX.format(digest_new=digests["1.1.0"], digest_old=digests["1.0.0"]))
+
+        handler = partial(Handler, directory=cls.root.name)
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.repo_url = "http://127.0.0.1:{}".format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        ChartRepo.http_pool.close()
+        cls.root.cleanup()
+
+    def setUp(self):
+        Handler.requests = []
+        self.cache_dir = tempfile.TemporaryDirectory()
+        ChartRepo._indexes.clear()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def _storage(self, **source):
+        source.update(repo_url=self.repo_url, chart="nginx", cache_dir=self.cache_dir.name)
+        return Storage(storage_type="repo", source=source)
+
+    def test_fetch_latest(self):
+        storage = self._storage(headers={"Authorization": "Basic dGVzdA=="})
+        self.assertEqual(storage.read("nginx/Chart.yaml"), b"name: nginx\nversion: 1.1.0\n")
+        self.assertEqual(storage.read("nginx/templates/deployment.yaml"), b"kind: Deployment\n")
+
+        self.assertEqual([r[0] for r in Handler.requests], ["/index.yaml", "/charts/nginx-1.1.0.tgz"])
+        # One pooled connection, headers sent on every request
+        self.assertEqual(len(set(r[1] for r in Handler.requests)), 1)
+        self.assertEqual(set(r[2] for r in Handler.requests), {"Basic dGVzdA=="})
+
+    def test_redirect_credentials(self):
+        pool = ConnectionPool()
+        self.addCleanup(pool.close)
+        port = self.server.server_address[1]
+        headers = {"Authorization": "Basic dGVzdA==", "Accept": "*/*"}
+        for target in ("/index.yaml", "http://localhost:{}/index.yaml".format(port)):
+            with pool.get(self.repo_url + "/moved?to=" + target, headers) as response:
+                self.assertEqual(response.status, 200)
+
+        # Kept on the same host, dropped once the redirect goes elsewhere
+        self.assertEqual([r[2] for r in Handler.requests], ["Basic dGVzdA==", "Basic dGVzdA==",
+                                                            "Basic dGVzdA==", None])
+        self.assertEqual(headers["Authorization"], "Basic dGVzdA==")
+
+    def test_find_latest(self):
+        entries = [{"version": v, "urls": ["nginx-{}.tgz".format(v)]}
+                   for v in ("1.9.0", "1.10.0", "1.10.0-rc.1", "1.2.0")]
+        entries.append({"version": "2.0.0", "urls": []})
+        repo = SimpleNamespace(chart="nginx", version=None, repo_url=self.repo_url)
+        entry = ChartRepo._find_chart(repo, {"entries": {"nginx": entries}})
+        self.assertEqual(entry["version"], "1.10.0")
+
+        repo.version = "1.9.0"
+        self.assertEqual(ChartRepo._find_chart(repo, {"entries": {"nginx": entries}})["version"], "1.9.0")
+        repo.version = "2.0.0"
+        with self.assertRaises(StorageError):
+            ChartRepo._find_chart(repo, {"entries": {"nginx": entries}})
+
+    def test_index_cache(self):
+        self._storage(version="1.0.0").read("nginx/Chart.yaml")
+        storage = self._storage(version="1.0.0")
+        self.assertEqual(storage.read("nginx/Chart.yaml"), b"name: nginx\nversion: 1.0.0\n")
+        self.assertEqual(len(ChartRepo._indexes), 1)
+
+        handler_log = []
+        original = Handler.send_response
+
+        def send_response(handler, code, message=None):
+            handler_log.append((handler.path, code))
+            original(handler, code, message)
+        Handler.send_response = send_response
+        try:
+            self._storage(version="1.0.0").read("nginx/Chart.yaml")
+        finally:
+            Handler.send_response = original
+        self.assertEqual(handler_log, [("/index.yaml", 304), ("/charts/nginx-1.0.0.tgz", 200)])
+
+    def test_not_found(self):
+        # Nothing is fetched until the chart is read
+        storage = self._storage(version="9.9.9")
+        self.assertEqual(Handler.requests, [])
+        with self.assertRaises(StorageError):
+            storage.read("nginx/Chart.yaml")
@@ -279,3 +279,14 @@ class TestRenderTemplate(TestCase):
         self.assertEqual(sec_template.template.strip(), secret_template.strip())
         print(sec_template.values)
         self.assertEqual(sec_template.values, secret_values)
+
+    def test_shared_values(self):
+        base_values = {"other": {"replicaCount": 2}}
+        template = ResourceTemplate(
+            self.chart_metadata,
+            service_name="test-web", services=[], values=base_values)
+        template.gen_kube_service(kube_svc)
+
+        self.assertEqual(template.changes, kube_svc_values)
+        self.assertEqual(base_values, {"other": {"replicaCount": 2}})
+        self.assertEqual(template.values, dict(base_values, **kube_svc_values))
@@ -0,0 +1,181 @@
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from git import Repo, Git
+
+from chart_builder.builder import Builder
+from chart_builder.storage import Storage, ScratchPool
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "chartbuilder",
+    "GIT_AUTHOR_EMAIL": "chartbuilder@example.com",
+    "GIT_COMMITTER_NAME": "chartbuilder",
+    "GIT_COMMITTER_EMAIL": "chartbuilder@example.com",
+}
+
+
+class GitRepoTestCase(TestCase):
+    """Base for tests that need a local bare repository as the remote."""
+
+    def setUp(self):
+        self.env_patch = mock.patch.dict(os.environ, GIT_ENV)
+        self.env_patch.start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.remote_path = os.path.join(self.tmp_dir.name, "remote.git")
+        self.remote_url = "file://" + self.remote_path
+        Repo.init(self.remote_path, bare=True, initial_branch="master")
+
+        self.seed = Repo.clone_from(self.remote_url, os.path.join(self.tmp_dir.name, "seed"))
+        self.commit_file("charts/nginx/Chart.yaml", "name: nginx\n")
+        self.commit_file("docs/README.md", "docs\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        self.env_patch.stop()
+
+    def commit_file(self, path, content):
+        file_path = os.path.join(self.seed.working_dir, path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as fd:
+            fd.write(content)
+        self.seed.git.add(path)
+        self.seed.index.commit("Add {}".format(path))
+        self.seed.git.push("origin", "HEAD:refs/heads/master")
+
+    def remote_file(self, path):
+        return Repo(self.remote_path).git.show("master:" + path)
+
+    def storage(self, **source):
+        source.update(git_url=self.remote_url, branch="master", path="charts")
+        return Storage(storage_type="git", source=source)
+
+
+class TestGitRepo(GitRepoTestCase):
+
+    def test_shallow_sparse_clone(self):
+        self.commit_file("charts/nginx/values.yaml", "replicaCount: 1\n")
+        storage = self.storage(depth=1, sparse=True)
+        work_dir = storage.work_dir
+
+        self.assertEqual(storage.read("nginx/values.yaml"), b"replicaCount: 1\n")
+        self.assertFalse(os.path.exists(os.path.join(work_dir._tmp_dir, "docs")))
+        self.assertEqual(work_dir.git_repo.git.rev_parse("--is-shallow-repository"), "true")
+        self.assertEqual(len(list(work_dir.git_repo.iter_commits())), 1)
+
+    def test_mirror_cache(self):
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        first = self.storage(cache_dir=cache_dir, sparse=True)
+        self.assertEqual(first.read("nginx/Chart.yaml"), b"name: nginx\n")
+        mirror_path = first.work_dir.mirror_path
+        self.assertTrue(os.path.isdir(mirror_path))
+        self.assertFalse(os.path.exists(os.path.join(first.work_dir._tmp_dir, "docs")))
+
+        self.commit_file("charts/redis/Chart.yaml", "name: redis\n")
+        second = self.storage(cache_dir=cache_dir)
+        self.assertEqual(second.work_dir.mirror_path, mirror_path)
+        self.assertEqual(second.read("redis/Chart.yaml"), b"name: redis\n")
+
+        second.write("nginx/Chart.yaml", "name: nginx\nversion: 2\n")
+        second.work_dir.push()
+        self.assertEqual(self.remote_file("charts/nginx/Chart.yaml"), "name: nginx\nversion: 2")
+
+
+class TestTransaction(GitRepoTestCase):
+
+    def build(self, storage, chart_name):
+        builder = Builder(chart_name, version="1.0", app_version="1.0", description="", storage=storage)
+        builder.build_chart()
+        builder.push()
+
+    def remote_log(self):
+        return Repo(self.remote_path).git.log("--format=%s", "master").splitlines()
+
+    def test_single_commit(self):
+        storage = self.storage()
+        with storage.transaction():
+            for name in ("redis", "mysql", "nginx"):
+                self.build(storage, name)
+            self.assertEqual(len(self.remote_log()), 2)
+
+        self.assertEqual(self.remote_log()[0], "Update Helm Chart by ChartBuilder.")
+        self.assertEqual(len(self.remote_log()), 3)
+        self.assertIn("name: mysql", self.remote_file("charts/mysql/Chart.yaml"))
+        self.assertEqual(self.remote_file("charts/nginx/templates/NOTES.txt"), "")
+
+    def test_commit_per_chart(self):
+        storage = self.storage()
+        with storage.transaction(commit_per_chart=True):
+            for name in ("redis", "mysql"):
+                self.build(storage, name)
+
+        self.assertEqual(self.remote_log()[:2], [
+            "Update Helm Chart mysql by ChartBuilder.",
+            "Update Helm Chart redis by ChartBuilder.",
+        ])
+
+    def test_rebase_retry(self):
+        storage = self.storage()
+        call_process = Git._call_process
+        pushes = []
+
+        def racing_call(git, method, *args, **kwargs):
+            if method == "push" and git is storage.work_dir.git_repo.git:
+                # Someone else pushes between our pull and our first push
+                if not pushes:
+                    self.commit_file("docs/CHANGELOG.md", "v2\n")
+                pushes.append(args)
+            return call_process(git, method, *args, **kwargs)
+
+        with mock.patch.object(Git, "_call_process", autospec=True, side_effect=racing_call):
+            with storage.transaction():
+                self.build(storage, "redis")
+        self.assertEqual(len(pushes), 2)
+        self.assertEqual(self.remote_file("docs/CHANGELOG.md"), "v2")
+        self.assertIn("name: redis", self.remote_file("charts/redis/Chart.yaml"))
+
+    def test_no_push_on_error(self):
+        storage = self.storage()
+        with self.assertRaises(ValueError):
+            with storage.transaction():
+                self.build(storage, "redis")
+                raise ValueError()
+        self.assertEqual(len(self.remote_log()), 2)
+
+
+class TestCleanup(GitRepoTestCase):
+
+    def test_close(self):
+        with self.storage() as storage:
+            storage.init_workdir("redis")
+            storage.write("redis/values.yaml", "replicaCount: 1\n")
+            tmp_dir = storage.source_path
+            self.assertTrue(os.path.isfile(os.path.join(tmp_dir, "redis/.helmignore")))
+        self.assertFalse(os.path.exists(tmp_dir))
+
+    def test_close_worktree(self):
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        with self.storage(cache_dir=cache_dir) as storage:
+            storage.read("nginx/Chart.yaml")
+            mirror = Repo(storage.work_dir.mirror_path)
+            self.assertEqual(len(mirror.git.worktree("list").splitlines()), 2)
+        self.assertEqual(len(mirror.git.worktree("list").splitlines()), 1)
+
+    def test_scratch_pool(self):
+        pool = ScratchPool(root=self.tmp_dir.name, prefill=1)
+        self.assertEqual(len(pool), 1)
+
+        tmp_dirs = []
+        for _ in range(3):
+            with Storage("git", {"git_url": self.remote_url, "path": "charts"}, scratch_pool=pool) as storage:
+                self.assertEqual(storage.read("nginx/Chart.yaml"), b"name: nginx\n")
+                storage.init_workdir("redis")
+                storage.write("redis/Chart.yaml", "name: redis\n")
+                tmp_dirs.append(storage.work_dir._tmp_dir)
+            self.assertEqual(len(pool), 1)
+        self.assertEqual(len(set(tmp_dirs)), 1)
+
+        # Released dirs are emptied
+        self.assertEqual(os.listdir(tmp_dirs[0]), [])
+        pool.close()
+        self.assertFalse(os.path.exists(tmp_dirs[0]))
@@ -0,0 +1,111 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+import grpc
+
+from hapi.chart.chart_pb2 import Chart
+from hapi.chart.metadata_pb2 import Metadata
+from hapi.release.status_pb2 import Status
+from hapi.services import tiller_pb2
+from helm_client.v2 import TillerClient, ReleaseSummary
+from tests.fake_tiller import FakeTiller, start_server
+
+chart = Chart(metadata=Metadata(name="test-chart", version="0.1"))
+
+
+class TestTillerClient(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tiller = FakeTiller()
+        self.server, self.port = await start_server(self.tiller)
+        self.client = TillerClient(port=self.port, max_concurrency=4)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop(None)
+
+    async def test_release_lifecycle(self):
+        release = await self.client.install_release(chart, name="web", namespace="prod")
+        self.assertEqual((release.name, release.version, release.namespace), ("web", 1, "prod"))
+
+        release = await self.client.update_release("web", chart)
+        self.assertEqual(release.version, 2)
+
+        release = await self.client.rollback_release("web", 1)
+        self.assertEqual(release.version, 3)
+
+        status = await self.client.get_release_status("web")
+        self.assertEqual(status.info.status.code, Status.DEPLOYED)
+
+        method, request = self.tiller.requests[0]
+        self.assertEqual(method, "InstallRelease")
+        self.assertEqual(request.chart.metadata.name, "test-chart")
+
+    async def test_release_request(self):
+        request = tiller_pb2.InstallReleaseRequest(name="web", namespace="prod")
+        request.chart.metadata.name = "test-chart"
+        release = await self.client.install_release_request(request)
+        self.assertEqual((release.name, release.version), ("web", 1))
+
+        request = tiller_pb2.UpdateReleaseRequest(name="web", chart=chart)
+        release = await self.client.update_release_request(request)
+        self.assertEqual(release.version, 2)
+        self.assertEqual(self.tiller.requests[0][1].chart.metadata.name, "test-chart")
+
+    async def test_list_releases(self):
+        for i in range(25):
+            await self.client.install_release(chart, name="web-{:02d}".format(i))
+
+        releases = []
+        async for response in self.client.list_releases():
+            releases.extend(r.name for r in response.releases)
+        self.assertEqual(releases, ["web-{:02d}".format(i) for i in range(25)])
+
+    async def test_concurrency_limit(self):
+        self.tiller.delay = 0.01
+        releases = await asyncio.gather(*[
+            self.client.install_release(chart, name="web-{:03d}".format(i))
+            for i in range(50)
+        ])
+        self.assertEqual(len(releases), 50)
+        self.assertEqual(self.tiller.max_in_flight, 4)
+
+    async def test_error(self):
+        with self.assertRaises(grpc.aio.AioRpcError) as cm:
+            await self.client.get_release_status("missing")
+        self.assertEqual(cm.exception.code(), grpc.StatusCode.NOT_FOUND)
+
+    async def test_iter_releases(self):
+        for i in range(95):
+            await self.client.install_release(chart, name="web-{:02d}".format(i))
+        self.tiller.requests.clear()
+
+        names = [r.name async for r in self.client.iter_releases(page_size=20)]
+        self.assertEqual(names, ["web-{:02d}".format(i) for i in range(95)])
+
+        offsets = [(r.limit, r.offset) for m, r in self.tiller.requests]
+        self.assertEqual(offsets, [(20, ""), (20, "web-20"), (20, "web-40"), (20, "web-60"), (20, "web-80")])
+
+    async def test_call_while_listing(self):
+        client = TillerClient(port=self.port, max_concurrency=1)
+        self.addAsyncCleanup(client.close)
+        for name in ("api", "web"):
+            await client.install_release(chart, name=name)
+
+        statuses = []
+        async for release in client.iter_releases(page_size=1):
+            status = await asyncio.wait_for(client.get_release_status(release.name), timeout=5)
+            statuses.append(status.info.status.code)
+        self.assertEqual(statuses, [Status.DEPLOYED, Status.DEPLOYED])
+
+    async def test_iter_release_summary(self):
+        await self.client.install_release(chart, name="web")
+        await self.client.update_release("web", chart)
+        await self.client.install_release(chart, name="api")
+
+        summaries = [r async for r in self.client.iter_releases(
+            page_size=1, summary=True, status_codes=[Status.DEPLOYED])]
+        self.assertEqual(summaries, [
+            ReleaseSummary("api", 1, Status.DEPLOYED),
+            ReleaseSummary("web", 2, Status.DEPLOYED),
+        ])
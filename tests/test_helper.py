@@ -0,0 +1,41 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from chart_builder import Builder
+from chart_builder.utils.helper import read_file
+
+CONTENT = "key: välue\n".encode('utf-8') + b"\xff\n"
+
+
+class TestReadFile(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "data.bin")
+        with open(self.path, "wb") as fd:
+            fd.write(CONTENT)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_raw_bytes(self):
+        self.assertEqual(read_file(self.path), CONTENT)
+        self.assertEqual(read_file(self.path, use_mmap=True), CONTENT)
+
+    def test_lossy_decode(self):
+        self.assertEqual(read_file(self.path, errors='ignore'), "key: välue\n\n".encode('utf-8'))
+
+    def test_empty_mmap(self):
+        empty = os.path.join(self.tmp_dir.name, "empty")
+        open(empty, "wb").close()
+        self.assertEqual(read_file(empty, use_mmap=True), b"")
+
+    def test_chart_files(self):
+        builder = Builder("testChart", version="1.0", app_version="1.0",
+                          description="", storage={"type": "memory"})
+        builder.add_file("files/data.bin", self.path, use_mmap=True)
+        chart = builder.build_chart()
+
+        self.assertEqual(len(chart.files), 1)
+        self.assertEqual(chart.files[0].type_url, "files/data.bin")
+        self.assertEqual(chart.files[0].value, CONTENT)
@@ -0,0 +1,75 @@
+import re
+import copy
+import random
+from unittest import TestCase
+
+from chart_builder.resources.base import NAME_PATTERN
+from chart_builder.resources.identifiers import NAME_RE, find_invalid, iter_identifiers, \
+    check_identifiers, check_identifiers_batch
+from chart_builder.utils.exceptions import DateSchemaValidationError
+
+DEPLOYMENT = {
+    "name": "test-nginx",
+    "containers": [
+        {
+            "name": "nginx",
+            "image": "nginx",
+            "env": [
+                {"name": "debug", "value": "1"},
+                {"name": "config", "valueFrom": {"configMapKeyRef": {"name": "test-cm", "key": "k"}}},
+            ],
+        },
+    ],
+    "volumes": [{"name": "config", "configMap": {"name": "test-cm"}}],
+}
+
+
+class TestIdentifiers(TestCase):
+
+    def test_same_language_as_name_pattern(self):
+        pattern = re.compile(NAME_PATTERN)
+        rng = random.Random(0)
+        alphabet = "ab9-_A\n"
+        for _ in range(5000):
+            value = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 9)))
+            self.assertEqual(bool(NAME_RE.search(value)), bool(pattern.search(value)), repr(value))
+            self.assertEqual(find_invalid([value]), [] if pattern.search(value) else [0])
+
+    def test_iter_identifiers(self):
+        self.assertEqual(list(iter_identifiers("deployment", DEPLOYMENT)), [
+            ("/name", "test-nginx"),
+            ("/containers/0/name", "nginx"),
+            ("/containers/0/env/0/name", "debug"),
+            ("/containers/0/env/1/name", "config"),
+            ("/containers/0/env/1/valueFrom/configMapKeyRef/name", "test-cm"),
+            ("/volumes/0/name", "config"),
+            ("/volumes/0/configMap/name", "test-cm"),
+        ])
+
+    def test_errors(self):
+        check_identifiers("deployment", DEPLOYMENT)
+
+        payload = copy.deepcopy(DEPLOYMENT)
+        payload["containers"][0]["env"][1]["name"] = "Bad_Name"
+        payload["volumes"][0]["configMap"]["name"] = "cm"
+        with self.assertRaises(DateSchemaValidationError) as cm:
+            check_identifiers("deployment", payload)
+        message = str(cm.exception)
+        self.assertIn("/containers/0/env/1/name: 'Bad_Name'", message)
+        self.assertIn("/volumes/0/configMap/name: 'cm'", message)
+
+    def test_batch(self):
+        resources = [("deployment", DEPLOYMENT)] * 50 + [("configmap", {"name": "test-cm", "data": {}})]
+        check_identifiers_batch(resources)
+
+        resources.append(("service", {"name": "test-svc", "component_name": "x"}))
+        with self.assertRaises(DateSchemaValidationError) as cm:
+            check_identifiers_batch(resources)
+        self.assertIn("/51/component_name: 'x'", str(cm.exception))
+
+    def test_newline_guard(self):
+        # "a\nbcde" would pass a joined check split on the wrong line
+        self.assertEqual(find_invalid(["abcde", "a\nbcde", "bcdef"]), [1])
+        # A trailing newline passes NAME_PATTERN, so it passes here too
+        self.assertEqual(find_invalid(["abcde\n", "bcdef"]), [])
+        self.assertEqual(find_invalid(["abcde", 12, None]), [1, 2])
@@ -0,0 +1,105 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+import grpc
+
+from hapi.chart.chart_pb2 import Chart
+from hapi.chart.metadata_pb2 import Metadata
+from helm_client.v2 import TillerClient
+from helm_client.orchestrator import ReleaseOrchestrator, ReleaseJob, \
+    STARTED, RETRYING, SUCCEEDED, FAILED
+from tests.fake_tiller import FakeTiller, start_server
+
+chart = Chart(metadata=Metadata(name="test-chart", version="0.1"))
+
+
+class SlowClient(object):
+    """Client that counts the releases in flight without a server."""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def install_release(self, chart, values=None, *, name="", namespace="default"):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+
+class TestReleaseOrchestrator(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tiller = FakeTiller()
+        self.server, port = await start_server(self.tiller)
+        self.client = TillerClient(port=port)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop(None)
+
+    async def test_namespace_concurrency(self):
+        self.tiller.delay = 0.01
+        jobs = [
+            ReleaseJob(chart, None, "ns-{}".format(i % 3), "web-{:02d}".format(i))
+            for i in range(30)
+        ]
+        orchestrator = ReleaseOrchestrator(self.client, workers=10, namespace_concurrency=1)
+        results = await orchestrator.rollout(jobs)
+
+        self.assertEqual(len(results), 30)
+        self.assertTrue(all(r.state == SUCCEEDED for r in results))
+        self.assertEqual(self.tiller.max_in_flight, 3)
+        self.assertEqual(self.tiller.releases["web-04"].namespace, "ns-1")
+
+    async def test_grouped_namespaces(self):
+        client = SlowClient()
+        jobs = [
+            ReleaseJob(chart, None, "ns-{}".format(i // 10), "web-{:02d}".format(i))
+            for i in range(100)
+        ]
+        orchestrator = ReleaseOrchestrator(client, workers=10, namespace_concurrency=1)
+        results = await orchestrator.rollout(jobs)
+
+        self.assertEqual(len(results), 100)
+        # A worker does not wait behind a busy namespace
+        self.assertEqual(client.max_in_flight, 10)
+
+    async def test_jobs_error(self):
+        def jobs():
+            yield ReleaseJob(chart, None, "default", "web")
+            raise ValueError("bad catalog")
+
+        orchestrator = ReleaseOrchestrator(self.client, workers=2)
+        with self.assertRaisesRegex(ValueError, "bad catalog"):
+            await asyncio.wait_for(orchestrator.rollout(jobs()), timeout=5)
+
+    async def test_retry_and_failure(self):
+        self.tiller.failures["InstallRelease"] = [grpc.StatusCode.UNAVAILABLE] * 2
+        self.tiller.failures["UpdateRelease"] = [grpc.StatusCode.INVALID_ARGUMENT]
+        jobs = [
+            ReleaseJob(chart, None, "default", "web"),
+            ReleaseJob(chart, None, "default", "api", upgrade=True),
+        ]
+        orchestrator = ReleaseOrchestrator(self.client, workers=1, backoff=0.001)
+
+        events = [(e.job.name, e.state, e.attempt) async for e in orchestrator.run(jobs)]
+        self.assertEqual(events, [
+            ("web", STARTED, 1),
+            ("web", RETRYING, 1),
+            ("web", RETRYING, 2),
+            ("web", SUCCEEDED, 3),
+            ("api", STARTED, 1),
+            ("api", FAILED, 1),
+        ])
+
+    async def test_give_up(self):
+        self.tiller.failures["InstallRelease"] = [grpc.StatusCode.UNAVAILABLE] * 3
+        orchestrator = ReleaseOrchestrator(self.client, max_retries=2, backoff=0.001)
+        results = await orchestrator.rollout([ReleaseJob(chart, None, "default", "web")])
+
+        self.assertEqual([(r.state, r.attempt) for r in results], [(FAILED, 3)])
+        self.assertEqual(results[0].error.code(), grpc.StatusCode.UNAVAILABLE)
@@ -0,0 +1,48 @@
+import io
+import copy
+import hashlib
+import tarfile
+from unittest import TestCase
+
+from chart_builder import Builder
+from tests.test_build_chart import deployment, kube_svc
+
+
+class TestPackage(TestCase):
+    def _builder(self):
+        builder = Builder("test-chart", version="1.0", app_version="1.0",
+                          description="", storage={"type": "memory"})
+        builder.add_deployment("web", copy.deepcopy(deployment))
+        builder.add_kube_service("web", copy.deepcopy(kube_svc))
+        return builder
+
+    def test_package(self):
+        builder = self._builder()
+        buffer = io.BytesIO()
+        self.assertEqual(builder.package(buffer), "test-chart-1.0.tgz")
+
+        buffer.seek(0)
+        with tarfile.open(fileobj=buffer, mode="r:gz") as tar:
+            members = tar.getmembers()
+            self.assertEqual([m.name for m in members], [
+                "test-chart/Chart.yaml",
+                "test-chart/values.yaml",
+                "test-chart/templates/configmaps.yaml",
+                "test-chart/templates/secrets.yaml",
+                "test-chart/templates/web_deployments.yaml",
+                "test-chart/templates/web_services.yaml",
+                "test-chart/.helmignore",
+            ])
+            self.assertTrue(all(m.mtime == 0 and m.uid == 0 and m.uname == "" for m in members))
+            self.assertEqual(
+                tar.extractfile("test-chart/templates/web_services.yaml").read(),
+                builder.storage.read("test-chart/templates/web_services.yaml"))
+            self.assertIn(b"name: test-chart", tar.extractfile("test-chart/Chart.yaml").read())
+
+    def test_reproducible(self):
+        digests = set()
+        for compresslevel in (9, 9, 1):
+            buffer = io.BytesIO()
+            self._builder().package(buffer, compresslevel=compresslevel)
+            digests.add(hashlib.sha256(buffer.getvalue()).hexdigest())
+        self.assertEqual(len(digests), 2)
@@ -0,0 +1,157 @@
+import os
+import copy
+import json
+import threading
+from unittest import TestCase, mock
+
+from chart_builder.resources import ResourceTemplate
+from chart_builder.resources.model import Deployment, Container
+from chart_builder.resources.serializer import SERIALIZER
+from chart_builder.resources.render import FragmentCache
+from chart_builder.builder import Metadata
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "render_corpus")
+
+GENERATORS = {
+    "deployment": "gen_deployment",
+    "service": "gen_kube_service",
+    "configmap": "gen_configmap",
+    "secret": "gen_secret",
+}
+
+
+def load_corpus():
+    for file_name in sorted(os.listdir(CORPUS_DIR)):
+        case_name, ext = os.path.splitext(file_name)
+        if ext != ".json" or case_name.endswith(".values"):
+            continue
+        with open(os.path.join(CORPUS_DIR, file_name)) as fd:
+            case = json.load(fd)
+        with open(os.path.join(CORPUS_DIR, case_name + ".yaml")) as fd:
+            template = fd.read()
+        with open(os.path.join(CORPUS_DIR, case_name + ".values.json")) as fd:
+            values = json.load(fd)
+        yield case_name, case, template, values
+
+
+class TestRenderCorpus(TestCase):
+    """Rendered templates must stay byte-identical to the recorded corpus."""
+
+    def setUp(self):
+        self.chart_metadata = Metadata(
+            apiVersion="v1",
+            name="test-chart",
+            version="0.1+build",
+            appVersion="1.0.0",
+            description="desc",
+        )
+
+    def test_corpus(self):
+        cases = list(load_corpus())
+        self.assertTrue(cases)
+        for case_name, case, template, values in cases:
+            with self.subTest(case=case_name):
+                generator = ResourceTemplate(self.chart_metadata, service_name=case['service_name'])
+                getattr(generator, GENERATORS[case['kind']])(case['payload'])
+                self.assertEqual(generator.template, template)
+                self.assertEqual(generator.values, values)
+
+    def test_fragment_cache(self):
+        cache = FragmentCache(max_entries=8)
+        cases = [c for c in load_corpus() if c[1]['kind'] == "deployment"]
+        self.assertTrue(cases)
+        with mock.patch.object(SERIALIZER, "fragment_cache", cache):
+            for _ in range(2):
+                for case_name, case, template, values in cases:
+                    with self.subTest(case=case_name):
+                        payload = copy.deepcopy(case['payload'])
+                        generator = ResourceTemplate(self.chart_metadata, service_name=case['service_name'])
+                        generator.gen_deployment(payload)
+                        self.assertEqual(generator.template, template)
+                        self.assertEqual(generator.values, values)
+        self.assertEqual(cache.hits, cache.misses)
+        self.assertLessEqual(len(cache), 8)
+
+    def test_fragment_cache_key_order(self):
+        probes = [{"initialDelaySeconds": 5, "periodSeconds": 10},
+                  {"periodSeconds": 10, "initialDelaySeconds": 5}]
+        with mock.patch.object(SERIALIZER, "fragment_cache", FragmentCache()):
+            cached = [SERIALIZER.containers([Container(name="nginx", readiness_probe=p)], indent=6)
+                      for p in probes]
+        with mock.patch.object(SERIALIZER, "fragment_cache", None):
+            uncached = [SERIALIZER.containers([Container(name="nginx", readiness_probe=p)], indent=6)
+                        for p in probes]
+        self.assertEqual(cached, uncached)
+        self.assertNotEqual(cached[0], cached[1])
+
+    def test_fragment_cache_shared_sidecar(self):
+        sidecar = {"name": "log-shipper", "image": "fluent-bit", "args": ["-c", "/etc/fluent-bit.conf"],
+                   "resources": {"limits": {"cpu": "100m"}}}
+        payloads = [{"name": "web-{}".format(i), "containers": [copy.deepcopy(sidecar)]} for i in range(3)]
+
+        rendered = {}
+        for name, cache in (("cached", FragmentCache()), ("uncached", None)):
+            with mock.patch.object(SERIALIZER, "fragment_cache", cache):
+                rendered[name] = []
+                for payload in payloads:
+                    generator = ResourceTemplate(self.chart_metadata, service_name="svc")
+                    generator.gen_deployment(payload)
+                    rendered[name].append(generator.template)
+            if cache is not None:
+                # The values key differs per deployment, the body does not
+                self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertEqual(rendered["cached"], rendered["uncached"])
+        self.assertIn(".Values.svc.web_1.log_shipper.imageVersion", rendered["cached"][1])
+
+    def test_fragment_cache_threads(self):
+        cache = FragmentCache(max_entries=4)
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(2000):
+                    key = (i + offset) % 16
+                    if cache.get(key, lambda: str(key)) != str(key):
+                        errors.append(key)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.hits + cache.misses, 16000)
+        self.assertLessEqual(len(cache), 4)
+
+    def test_fragment_cache_eviction(self):
+        cache = FragmentCache(max_entries=2)
+        for key in ("a", "b", "a", "c"):
+            cache.get(key, lambda: key.upper())
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertEqual(cache.get("a", lambda: "new"), "A")
+        self.assertEqual(cache.get("b", lambda: "new"), "new")
+
+    def test_resources(self):
+        for case_name, case, template, values in load_corpus():
+            with self.subTest(case=case_name):
+                payload = copy.deepcopy(case['payload'])
+                resources = []
+                for _ in range(2):
+                    generator = ResourceTemplate(self.chart_metadata, service_name=case['service_name'])
+                    getattr(generator, GENERATORS[case['kind']])(payload)
+                    resources.append(generator.resource)
+                # Building does not touch the payload
+                self.assertEqual(payload, case['payload'])
+                self.assertEqual(resources[0], resources[1])
+                self.assertEqual(resources[0].digest(), resources[1].digest())
+                self.assertEqual(resources[0].KIND, case['kind'])
+
+        deployment = Deployment(name="web", containers=[Container(name="nginx")])
+        self.assertEqual(deployment.to_dict()["containers"][0]["name"], "nginx")
+        self.assertNotEqual(deployment.digest(), Deployment(name="web", containers=[]).digest())
+        with self.assertRaises(AttributeError):
+            deployment.extra = 1
+        with self.assertRaises(TypeError):
+            Deployment(nmae="web")
@@ -1,16 +1,18 @@
+import os
+import tempfile
 from unittest import TestCase, mock
 
 from chart_builder.storage import Storage
 
 MKDTEMP = mock.Mock(return_value="/tmp/chartbuilder-xxx")
-RMDTEMP = mock.MagicMock()
+RMTREE = mock.MagicMock()
 
 
 class TestStorage(TestCase):
 
     def setUp(self):
         MKDTEMP.reset_mock()
-        RMDTEMP.reset_mock()
+        RMTREE.reset_mock()
 
     def test_local_dir(self):
         storage_type = "local"
@@ -30,8 +32,8 @@ class TestStorage(TestCase):
 
     @mock.patch("git.Repo.clone_from")
     @mock.patch("tempfile.mkdtemp", new=MKDTEMP)
-    @mock.patch("os.rmdir", new=RMDTEMP)
-    def test_git_repo(self, *args):
+    @mock.patch("shutil.rmtree", new=RMTREE)
+    def test_git_repo(self, clone_from):
         storage_type = "git"
         source = {
             "git_url": "https://git.hypo.vim/helm/chart",
@@ -40,21 +42,55 @@ class TestStorage(TestCase):
             "sub_path": "v1"
         }
 
-        MKDTEMP.assert_not_called()
-        storage = Storage(
+        with Storage(
             storage_type=storage_type,
             source=source,
-        )
-        MKDTEMP.assert_called_once()
-
-        self.assertEqual(
-            storage.source_path,
-            "/tmp/chartbuilder-xxx/charts/nginx/v1"
-        )
+        ) as storage:
+            storage.init_workdir("nginx")
+            # Nothing is cloned until the work dir is used
+            MKDTEMP.assert_not_called()
+            clone_from.assert_not_called()
 
-        RMDTEMP.assert_not_called()
-        del storage
-        RMDTEMP.assert_called_once()
+            self.assertEqual(
+                storage.source_path,
+                "/tmp/chartbuilder-xxx/charts/nginx/v1"
+            )
+            MKDTEMP.assert_called_once()
+            clone_from.assert_called_once()
+            RMTREE.assert_not_called()
+        RMTREE.assert_called_once_with("/tmp/chartbuilder-xxx", True)
 
     def test_chart_repo(self):
         pass
+
+    def test_memory(self):
+        storage = Storage(storage_type="memory")
+        self.assertTrue(storage.in_memory)
+
+        storage.init_workdir("test")
+        self.assertIn(".git/", storage.read("test/.helmignore").decode())
+        self.assertEqual(storage.read("test/values.yaml"), b"")
+
+        storage.write("test/values.yaml", "a: 1\n")
+        self.assertEqual(storage.read("test/values.yaml"), b"a: 1\n")
+
+    def test_local_dir_skip_unchanged(self):
+        with tempfile.TemporaryDirectory() as path:
+            storage = Storage(storage_type="local", source={"path": path})
+            storage.init_workdir("test")
+            file_path = os.path.join(path, "test/values.yaml")
+
+            self.assertTrue(storage.write("test/values.yaml", "a: 1\n"))
+            os.utime(file_path, ns=(0, 0))
+            with mock.patch("os.replace") as replace:
+                self.assertFalse(storage.write("test/values.yaml", "a: 1\n"))
+            replace.assert_not_called()
+            self.assertEqual(os.stat(file_path).st_mtime_ns, 0)
+
+            # Changes made behind the storage's back are noticed
+            with open(file_path, "w") as fd:
+                fd.write("a: 2\n")
+            self.assertTrue(storage.write("test/values.yaml", "a: 1\n"))
+            self.assertEqual(storage.read("test/values.yaml"), b"a: 1\n")
+            self.assertEqual(sorted(os.listdir(os.path.join(path, "test"))), [
+                ".helmignore", "Chart.yaml", "README.md", "charts", "templates", "values.yaml"])
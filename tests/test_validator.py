@@ -0,0 +1,47 @@
+from unittest import TestCase, mock, skipIf
+
+import chart_builder.utils.helper as helper
+from chart_builder.utils.exceptions import DateSchemaValidationError
+from chart_builder.resources.deployment import DEPLOYMENT_SCHEMA
+from chart_builder.resources.service import SERVICE_SCHEMA
+
+deployment = {
+    "name": "test-nginx",
+    "containers": [{"name": "nginx", "image": "nginx"}],
+}
+
+
+class TestValidatorRegistry(TestCase):
+
+    def setUp(self):
+        helper.VALIDATORS.clear()
+
+    def tearDown(self):
+        helper.enable_fast_validation(False)
+        helper.VALIDATORS.clear()
+
+    def test_compile_once(self):
+        with mock.patch.object(helper, "validator_for", wraps=helper.validator_for) as compile_:
+            helper.resource_payload_validator("test-nginx", DEPLOYMENT_SCHEMA, deployment)
+            helper.resource_payload_validator("test-nginx", DEPLOYMENT_SCHEMA, deployment)
+        compile_.assert_called_once()
+
+        validator = helper.get_validator(DEPLOYMENT_SCHEMA)
+        self.assertIs(validator, helper.get_validator(DEPLOYMENT_SCHEMA))
+        self.assertIsNot(validator, helper.get_validator(SERVICE_SCHEMA))
+
+    def test_invalid_payload(self):
+        payload = {"name": "test-nginx", "containers": []}
+        with self.assertRaises(DateSchemaValidationError):
+            helper.resource_payload_validator("test-nginx", DEPLOYMENT_SCHEMA, payload)
+
+    @skipIf(helper.fastjsonschema is None, "fastjsonschema is not installed")
+    def test_fast_path(self):
+        helper.enable_fast_validation()
+        validator = helper.get_validator(DEPLOYMENT_SCHEMA)
+        self.assertIsInstance(validator, helper._FastValidator)
+
+        helper.resource_payload_validator("test-nginx", DEPLOYMENT_SCHEMA, deployment)
+        payload = {"name": "Bad_Name", "containers": [{"name": "nginx", "image": "nginx"}]}
+        with self.assertRaises(DateSchemaValidationError):
+            helper.resource_payload_validator("Bad_Name", DEPLOYMENT_SCHEMA, payload)
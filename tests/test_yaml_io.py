@@ -0,0 +1,50 @@
+import os
+import json
+from unittest import TestCase, skipIf
+
+import yaml
+
+from chart_builder.utils import yaml_io
+from chart_builder.utils.yaml_io import dump_yaml, load_yaml
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "render_corpus")
+
+VALUES = {
+    "web": {
+        "replicaCount": 3,
+        "image": "nginx:1.19",
+        "enabled": True,
+        "ratio": 0.5,
+        "empty": None,
+        "ports": [80, 443],
+        "env": {"GREETING": "héllo wörld", "MOTD": "line one\nline two\n"},
+        "args": ["--flag=" + "x" * 120, "", "yes", "0123", "a: b"],
+    },
+    "api": {"nested": {"deep": {"list": [{"a": 1}, {"b": [1, 2, {}]}]}}},
+}
+
+
+class TestYamlIO(TestCase):
+
+    def test_round_trip(self):
+        self.assertEqual(load_yaml(dump_yaml(VALUES)), VALUES)
+
+    def test_key_order(self):
+        data = {"name": "chart", "apiVersion": "v1", "version": "1.0"}
+        self.assertEqual(dump_yaml(data), "apiVersion: v1\nname: chart\nversion: '1.0'\n")
+        self.assertEqual(dump_yaml(data, sort_keys=False), "name: chart\napiVersion: v1\nversion: '1.0'\n")
+
+    @skipIf(not yaml.__with_libyaml__, "PyYAML built without libyaml")
+    def test_emitters_agree(self):
+        self.assertIs(yaml_io.Dumper, yaml.CDumper)
+        trees = [VALUES]
+        for file_name in sorted(os.listdir(CORPUS_DIR)):
+            if file_name.endswith(".values.json"):
+                with open(os.path.join(CORPUS_DIR, file_name)) as fd:
+                    trees.append(json.load(fd))
+
+        for tree in trees:
+            for sort_keys in (True, False):
+                self.assertEqual(
+                    dump_yaml(tree, sort_keys=sort_keys),
+                    dump_yaml(tree, sort_keys=sort_keys, dumper=yaml_io.PyDumper))